@@ -0,0 +1,319 @@
+# Importing all needed modules.
+from contextlib import redirect_stdout
+import platform
+import argparse
+import random
+import json
+import time
+import sys
+import io
+
+from dialog import DialogGraph, PhraseFormatter, RandomPhrase
+from codec import JSON_BACKENDS, MSGPACK_BACKEND
+from cache_round_robin import CacheRoundRobin
+from cerber import SecurityManager
+from hash_ring import HashRing
+from schemas import MessageSchema
+
+# The registry of the benchmarks, filled by the benchmark decorator.
+BENCHMARKS = {}
+
+def benchmark(name : str):
+    '''
+        This function registers a benchmark.
+        A benchmark is a function receiving the random generator and returning the
+        (function, inputs) pair, the function being called once per input.
+            :param name: str
+                The name of the benchmark.
+    '''
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+# The vocabulary of the generated messages.
+WORDS = ["hi", "please", "show", "me", "my", "exercise", "meals", "for", "today", "tomorrow",
+         "update", "weight", "height", "to", "80", "175", "stats", "thanks", "bye", "tired"]
+DATES = ["today", "tomorrow", "yesterday", "monday", "next friday", "in 3 days", "17 october", "2026-11-02"]
+NOUNS = ["weight", "my weight", "height", "the height", "stats"]
+
+def generate_message(generator : random.Random) -> dict:
+    '''
+        This function generates the body of a /message request.
+    '''
+    return {
+        "text" : " ".join(generator.choice(WORDS) for _ in range(generator.randint(1, 12))),
+        "telegram_user_id" : generator.randint(10 ** 8, 10 ** 9),
+        "first_name" : "Jane",
+        "last_name" : "Doe",
+        "username" : f"user_{generator.randint(1, 10 ** 6)}",
+        "chat_id" : generator.randint(10 ** 8, 10 ** 9)
+    }
+
+def generate_ners(generator : random.Random) -> dict:
+    '''
+        This function generates the named entities predicted for a message.
+    '''
+    ners = {}
+    if generator.random() < 0.4:
+        ners["DATE"] = [generator.choice(DATES) for _ in range(generator.randint(1, 2))]
+    if generator.random() < 0.3:
+        ners["CARDINAL"] = [str(generator.choice([70, 80, 1.75, 175])) for _ in range(generator.randint(1, 2))]
+    if generator.random() < 0.3:
+        ners["NOUNS"] = [generator.choice(NOUNS) for _ in range(generator.randint(1, 2))]
+    if generator.random() < 0.2:
+        ners["PERSON"] = ["John"]
+    return ners
+
+def reference_workload(generator : random.Random) -> tuple:
+    '''
+        This function returns the reference workload, a pure Python word count measured next to every benchmark.
+        The benchmarks are stored as ratios to it, so the speed of the machine and its load cancel out.
+    '''
+    def count_words(text : str) -> dict:
+        counts = {}
+        for word in text.split():
+            counts[word] = counts.get(word, 0) + 1
+        return counts
+    return count_words, [generate_message(generator)["text"] for _ in range(1000)]
+
+def load_dialog_graph() -> DialogGraph:
+    '''
+        This function loads the dialog graph and phrases served by the dialog manager.
+    '''
+    with open("predefined_phrases.json", "r") as phrases_file:
+        predefined_phrases = json.load(phrases_file)
+    return DialogGraph.from_file("dialog_graph.json", predefined_phrases), predefined_phrases
+
+@benchmark("security_encode_hmac")
+def bench_encode_hmac(generator : random.Random) -> tuple:
+    security_manager = SecurityManager("dialog-manager-key")
+    return security_manager._SecurityManager__encode_hmac, [generate_message(generator) for _ in range(1000)]
+
+@benchmark("security_sign_request")
+def bench_sign_request(generator : random.Random) -> tuple:
+    security_manager = SecurityManager("dialog-manager-key")
+    return security_manager.sign_request, [generate_message(generator) for _ in range(1000)]
+
+@benchmark("security_verify")
+def bench_verify(generator : random.Random) -> tuple:
+    security_manager = SecurityManager("dialog-manager-key")
+    inputs = [security_manager.sign_request(generate_message(generator)) for _ in range(1000)]
+    return lambda signed : security_manager.verify(signed[1]["Token"], signed[0]), inputs
+
+@benchmark("schema_validate_json")
+def bench_validate_json(generator : random.Random) -> tuple:
+    message_schema = MessageSchema()
+    return message_schema.validate_json, [generate_message(generator) for _ in range(1000)]
+
+@benchmark("dialog_get_action")
+def bench_get_action(generator : random.Random) -> tuple:
+    graph, _ = load_dialog_graph()
+    dialog_manager = graph.dialog_manager
+    states = list(graph.states) + [graph.initial_state]
+    intents = dialog_manager.accepted_actions + ["oos", "yes", "no"]
+    inputs = [(generator.choice(states), generator.choice(intents), generate_ners(generator)) for _ in range(1000)]
+    return lambda args : dialog_manager.get_action_from_intent_and_ners(*args), inputs
+
+@benchmark("dialog_post_process_ners")
+def bench_post_process_ners(generator : random.Random) -> tuple:
+    graph, _ = load_dialog_graph()
+    return graph.dialog_manager.post_process_ners, [generate_ners(generator) for _ in range(1000)]
+
+@benchmark("dialog_get_new_state")
+def bench_get_new_state(generator : random.Random) -> tuple:
+    graph, _ = load_dialog_graph()
+    dialog_manager = graph.dialog_manager
+    states = list(graph.states) + [graph.initial_state]
+    intents = dialog_manager.accepted_actions + ["oos", "yes", "no"]
+    inputs = [(generator.choice(states), generator.choice(intents), generate_ners(generator), 0.5) for _ in range(1000)]
+    return lambda args : dialog_manager.get_new_state(*args), inputs
+
+@benchmark("full_state_get_params_for_request")
+def bench_get_params_for_request(generator : random.Random) -> tuple:
+    graph, _ = load_dialog_graph()
+    full_state_request_creator = graph.full_state_request_creator
+    inputs = []
+    for _ in range(1000):
+        state = generator.choice(full_state_request_creator.full_state_list)
+        weight, height = generator.randint(50, 120), generator.randint(150, 200)
+        text = f"update my weight to {weight} and height to {height}"
+        ners = {"DATE" : ["17-10-2026"], "NOUNS" : ["weight", "height"], "CARDINAL" : [weight, height]}
+        inputs.append((state, text, ners))
+    return lambda args : full_state_request_creator.get_params_for_request(*args), inputs
+
+@benchmark("phrase_formatter")
+def bench_phrase_formatter(generator : random.Random) -> tuple:
+    with open("phrases_formats.json", "r") as formats_file:
+        phrase_formatter = PhraseFormatter(json.load(formats_file))
+    responses = {
+        "GET_PROGRESS" : lambda : {"exists" : "yes", "value" : generator.randint(1, 100), "measure_of_progress" : "kg"},
+        "GET_EXERCISE" : lambda : {"date" : "17-10-2026", "exercises" : [{"type" : "push-ups", "count" : generator.randint(5, 50)}] * 3},
+        "GET_MEALS" : lambda : {"date" : "17-10-2026", "meals" : {"breakfast" : {"eggs" : 120, "bread" : 60}, "dinner" : {"rice" : 150}}},
+        "UPDATE_PARAMETERS" : lambda : {"result" : "Your weight was updated!"},
+        "GET_STATS" : lambda : {"weight" : generator.randint(50, 120), "height" : generator.randint(150, 200)},
+        "KCALS_BURNED" : lambda : {"date" : "17-10-2026", "kcals_burned" : generator.randint(100, 900)},
+        "KCALS_GAINED" : lambda : {"date" : "17-10-2026", "kcals_gained" : generator.randint(1000, 3000)}
+    }
+    states = list(responses)
+    inputs = [(state, responses[state]()) for state in (generator.choice(states) for _ in range(1000))]
+    return lambda args : phrase_formatter(*args), inputs
+
+@benchmark("random_phrase_get_phrase")
+def bench_get_phrase(generator : random.Random) -> tuple:
+    _, predefined_phrases = load_dialog_graph()
+    random_phrase = RandomPhrase(predefined_phrases)
+    return random_phrase.get_phrase, [generator.choice(random_phrase.servable_states) for _ in range(1000)]
+
+@benchmark("cache_ring_nodes_for")
+def bench_nodes_for(generator : random.Random) -> tuple:
+    ring = HashRing([f"cache-service-{index}" for index in range(1, 9)])
+    inputs = [CacheRoundRobin.routing_key(generate_message(generator)["text"]) for _ in range(1000)]
+    return lambda key : ring.nodes_for(key, 2), inputs
+
+def generate_codec_payload(generator : random.Random) -> dict:
+    '''
+        This function generates one of the bodies passing through the codec.
+    '''
+    return generator.choice([
+        lambda : generate_message(generator),
+        lambda : {"text" : generate_message(generator)["text"], "prediction" : {"intent" : generator.choice(WORDS), "score" : generator.random()}},
+        lambda : {"prediction" : generate_ners(generator)},
+        lambda : {"date" : "17-10-2026", "meals" : {"breakfast" : {"eggs" : 120, "bread" : 60}, "dinner" : {"rice" : 150}}}
+    ])()
+
+def codec_benchmarks(name : str, dumps, loads) -> None:
+    '''
+        This function registers the encoding and decoding benchmarks of a codec backend.
+            :param name: str
+                The name of the backend.
+            :param dumps: callable
+                The encoding function of the backend.
+            :param loads: callable
+                The decoding function of the backend.
+    '''
+    @benchmark(f"codec_{name}_dumps")
+    def bench_dumps(generator : random.Random) -> tuple:
+        return dumps, [generate_codec_payload(generator) for _ in range(1000)]
+
+    @benchmark(f"codec_{name}_loads")
+    def bench_loads(generator : random.Random) -> tuple:
+        return loads, [dumps(generate_codec_payload(generator)) for _ in range(1000)]
+
+# Comparing the installed codec backends on the same payloads.
+for backend_name in JSON_BACKENDS:
+    codec_benchmarks(backend_name, *JSON_BACKENDS[backend_name])
+if MSGPACK_BACKEND is not None:
+    codec_benchmarks("msgpack", *MSGPACK_BACKEND)
+
+def measure(function, inputs : list, min_time : float, repeats : int) -> float:
+    '''
+        This function measures the throughput of a function.
+            :param function: callable
+                The measured function, called once per input.
+            :param inputs: list
+                The inputs of the function.
+            :param min_time: float
+                The minimal number of seconds of a measure.
+            :param repeats: int
+                The number of measures, the best one being kept.
+            :return: float
+                The number of calls per second.
+    '''
+    best = 0.0
+    # Silencing the prints of the measured functions.
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            calls, start = 0, time.perf_counter()
+            while True:
+                for args in inputs:
+                    function(args)
+                calls += len(inputs)
+                elapsed = time.perf_counter() - start
+                if elapsed >= min_time:
+                    break
+            best = max(best, calls / elapsed)
+    return best
+
+def measure_ratio(function, inputs : list, reference_function, reference_inputs : list, min_time : float, repeats : int) -> tuple:
+    '''
+        This function measures the throughput of a function relative to the reference workload.
+        Every measure of the function is followed by a measure of the reference, so both share the same machine state.
+            :param function: callable
+                The measured function, called once per input.
+            :param inputs: list
+                The inputs of the function.
+            :param reference_function: callable
+                The function of the reference workload.
+            :param reference_inputs: list
+                The inputs of the reference workload.
+            :param min_time: float
+                The minimal number of seconds of a measure.
+            :param repeats: int
+                The number of measures, the median ratio being kept.
+            :return: tuple
+                The best number of calls per second and the median ratio to the reference.
+    '''
+    best, ratios = 0.0, []
+    for _ in range(repeats):
+        ops = measure(function, inputs, min_time, 1)
+        ratios.append(ops / measure(reference_function, reference_inputs, min_time, 1))
+        best = max(best, ops)
+    return best, sorted(ratios)[len(ratios) // 2]
+
+def main() -> int:
+    # Parsing the command line arguments.
+    argument_parser = argparse.ArgumentParser(description="Benchmarks the in-process hot path of the dialog manager.")
+    argument_parser.add_argument("--baselines", default="benchmark_baselines.json", help="The file of the stored baselines.")
+    argument_parser.add_argument("--threshold", type=float, default=0.2, help="The tolerated drop of the ratios to the reference below the baselines.")
+    argument_parser.add_argument("--save", action="store_true", help="Stores the results as the new baselines.")
+    argument_parser.add_argument("--filter", default="", help="Runs only the benchmarks containing this string.")
+    argument_parser.add_argument("--min-time", type=float, default=0.5, help="The minimal number of seconds of a measure.")
+    argument_parser.add_argument("--repeats", type=int, default=5, help="The number of measures of a benchmark.")
+    argument_parser.add_argument("--seed", type=int, default=2023, help="The seed of the generated inputs.")
+    args = argument_parser.parse_args()
+
+    try:
+        with open(args.baselines, "r") as baselines_file:
+            baselines = json.load(baselines_file)
+    except FileNotFoundError:
+        baselines = {}
+    baseline_ratios = baselines.get("ratios", {})
+    machine = {"platform" : platform.platform(), "processor" : platform.processor(), "python" : platform.python_version()}
+    if baselines.get("machine", machine) != machine:
+        print(f"The baselines were measured on {baselines['machine']}, the ratios may still differ on {machine}")
+
+    reference_function, reference_inputs = reference_workload(random.Random(args.seed))
+    results, regressions = {}, []
+    for name in BENCHMARKS:
+        if args.filter not in name:
+            continue
+        function, inputs = BENCHMARKS[name](random.Random(args.seed))
+        ops, ratio = measure_ratio(function, inputs, reference_function, reference_inputs, args.min_time, args.repeats)
+        results[name] = round(ratio, 4)
+
+        # Comparing the ratio to the baseline.
+        baseline = baseline_ratios.get(name)
+        if baseline:
+            change = results[name] / baseline - 1
+            status = "REGRESSION" if change < -args.threshold else "ok"
+            if status == "REGRESSION":
+                regressions.append(name)
+            print(f"{name:40} {ops:>14,.1f} ops/s  ratio {results[name]:>9.4f}  baseline {baseline:>9.4f}  {change:+7.1%}  {status}")
+        else:
+            print(f"{name:40} {ops:>14,.1f} ops/s  ratio {results[name]:>9.4f}  no baseline")
+
+    if args.save:
+        baseline_ratios.update(results)
+        with open(args.baselines, "w") as baselines_file:
+            json.dump({"machine" : machine, "ratios" : baseline_ratios}, baselines_file, indent=2)
+        print(f"Baselines saved to {args.baselines}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,79 +1,333 @@
 # Importing all needed modules.
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextvars
 import requests
+from prediction_cache import PredictionCache
+from http_client import HttpClient
+from hash_ring import HashRing
 from cerber import SecurityManager
+from metrics import metrics
+from tracing import tracer
+from codec import codec
+
+# Declaring the metrics of the cache requests.
+metrics.histogram("dialog_manager_cache_request_seconds", "The duration of the requests to the caches.")
+metrics.counter("dialog_manager_cache_errors", "The number of cache requests that failed or couldn't be answered.")
+
+# The statuses of a cache lookup.
+HIT = "hit"
+MISS = "miss"
+ERROR = "error"
+UNSUPPORTED = "unsupported"
+
+
+class CacheResult:
+    __slots__ = ("status", "body")
+
+    def __init__(self, status : str, body : dict = None) -> None:
+        '''
+            The constructor of the result of a cache lookup.
+                :param status: str
+                    HIT, MISS, ERROR or UNSUPPORTED.
+                :param body: dict, default = None
+                    The decoded response of the cache on a hit.
+        '''
+        self.status = status
+        self.body = body
+
+    def __repr__(self) -> str:
+        return f"CacheResult({self.status})"
 
 
 class CacheRoundRobin:
-    def __init__(self, caches : dict) -> None:
+    def __init__(self,
+                 caches : dict,
+                 local_cache : PredictionCache = None,
+                 http_client : HttpClient = None,
+                 virtual_nodes : int = 128,
+                 replicas : int = 1,
+                 parallel_reads : bool = False) -> None:
         '''
             The constructor of the Cache Round Robin.
+            Every text is routed by a consistent hash to the cache owning it.
                 :param caches: dict
                     The dictionary representing the credentials of the caches.
+                :param local_cache: PredictionCache, default = None
+                    The in-process cache consulted before the remote caches.
+                :param http_client: HttpClient, default = None
+                    The shared HTTP client used to call the caches.
+                :param virtual_nodes: int, default = 128
+                    The number of positions of every cache on the hash ring.
+                :param replicas: int, default = 1
+                    The number of caches holding the predictions of a text, the owner and the next ones on the ring.
+                :param parallel_reads: bool, default = False
+                    True to read the replicas of a text concurrently, the first cache answering winning.
         '''
         # Setting up the class fields.
-        self.caches = caches
-        self.caches_list = list(self.caches.keys())
-        self.responsible_cache = self.caches_list[0]
-
-        # Configuring the HMAC generators for the caches.
-        self.security_managers = {
-            cache : SecurityManager(caches[cache]["security"]["secret_key"])
-            for cache in caches
-        }
+        self.caches = {}
+        self.security_managers = {}
+        self.local_cache = local_cache
+        self.http_client = http_client if http_client is not None else HttpClient()
+        self.ring = HashRing(virtual_nodes=virtual_nodes)
+        self.replicas = max(1, replicas)
+        self.parallel_reads = parallel_reads
+
+        # Creation of the executor of the parallel reads.
+        self.executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="cache-reads") \
+            if parallel_reads and self.replicas > 1 else None
+
+        # Placing the caches on the hash ring.
+        for cache in caches:
+            self.add_cache(cache, caches[cache])
+
+    def add_cache(self, cache : str, credentials : dict) -> None:
+        '''
+            This function adds a cache, which takes over only its share of the texts.
+                :param cache: str
+                    The name of the cache.
+                :param credentials: dict
+                    The credentials of the cache, as returned by the Service Discovery.
+        '''
+        # Configuring the HMAC generator before the cache can be routed to.
+        self.security_managers[cache] = SecurityManager(credentials["security"]["secret_key"])
+        self.caches[cache] = credentials
+        self.ring.add_node(cache)
+
+    def remove_cache(self, cache : str) -> None:
+        '''
+            This function removes a cache, its texts moving to the following caches on the ring.
+                :param cache: str
+                    The name of the cache.
+        '''
+        # Taking the cache off the ring before dropping its credentials.
+        self.ring.remove_node(cache)
+        self.caches.pop(cache, None)
+        self.security_managers.pop(cache, None)
+
+    @staticmethod
+    def routing_key(text : str) -> str:
+        '''
+            This function normalizes a text into the key it is routed by.
+            All the predictions of a text are routed together, so a batched lookup stays one request.
+                :param text: str
+                    The text of the message.
+        '''
+        return " ".join(text.lower().split())
+
+    def request_cache(self, cache : str, endpoint : str, data_json : dict, method : str = "GET") -> requests.Response:
+        '''
+            This function sends a signed request to one of the caches.
+                :param cache: str
+                    The name of the cache to request.
+                :param endpoint: str
+                    The endpoint of the cache to call.
+                :param data_json: dict
+                    The request body.
+                :param method: str, default = "GET"
+                    The HTTP method of the request.
+                :return: requests.Response
+                    The response of the cache or None if the cache couldn't be reached or was removed.
+        '''
+        # Reading the cache once, as it may be removed while the request is routed to it.
+        security_manager, credentials = self.security_managers.get(cache), self.caches.get(cache)
+        if security_manager is None or credentials is None:
+            return None
+
+        # Serializing the request once and signing the sent bytes.
+        body, headers = security_manager.sign_request(data_json, binary=True)
+
+        # Requesting the Cache.
+        try:
+            with metrics.timer("dialog_manager_cache_request_seconds", cache=cache, endpoint=endpoint, method=method), \
+                    tracer.span("cache_request", cache=cache, endpoint=endpoint, method=method):
+                return self.http_client.request(
+                    method,
+                    f"http://{credentials['general']['host']}:{credentials['general']['port']}/{endpoint}",
+                    data = body,
+                    headers = headers
+                )
+        except requests.RequestException:
+            return None
+
+    def lookup(self, cache : str, endpoint : str, data_json : dict) -> CacheResult:
+        '''
+            This function looks a text up in one of the caches.
+                :param cache: str
+                    The name of the cache to request.
+                :param endpoint: str
+                    The lookup endpoint of the cache, "cache" or "cache_batch".
+                :param data_json: dict
+                    The request body.
+                :return: CacheResult
+                    HIT with the response body, MISS if the cache answered it doesn't hold
+                    the prediction and ERROR if the cache couldn't answer.
+        '''
+        response = self.request_cache(cache, endpoint, data_json)
+
+        if response is None or response.status_code >= 500:
+            metrics.increment("dialog_manager_cache_errors", cache=cache)
+            return CacheResult(ERROR)
+        elif response.status_code == 200:
+            body = codec.decode_response(response)
+            if endpoint == "cache" and body.get("prediction") is None:
+                return CacheResult(MISS)
+            return CacheResult(HIT, body)
+        elif response.status_code == 404 and endpoint == "cache":
+            # The cache answers 404 for the texts it doesn't hold.
+            return CacheResult(MISS)
+        elif response.status_code == 404:
+            # The cache doesn't serve the endpoint.
+            return CacheResult(UNSUPPORTED)
+        else:
+            metrics.increment("dialog_manager_cache_errors", cache=cache)
+            return CacheResult(ERROR)
+
+    def first_answer(self, caches : list, endpoint : str, data_json : dict) -> CacheResult:
+        '''
+            This function looks a text up in several caches, trying them one after another.
+            If the parallel reads are enabled the replicas of the text are requested at once, the first one answering winning.
+            The caches failing are skipped.
+                :param caches: list
+                    The names of the caches, the replicas first, in the order they should be tried.
+                :param endpoint: str
+                    The lookup endpoint of the caches.
+                :param data_json: dict
+                    The request body.
+                :return: CacheResult
+                    The first answer or ERROR if no cache answered.
+        '''
+        if self.parallel_reads and self.replicas > 1:
+            # Requesting the replicas concurrently, each request running in a copy of the caller context.
+            futures = [
+                self.executor.submit(contextvars.copy_context().run, self.lookup, cache, endpoint, data_json)
+                for cache in caches[:self.replicas]
+            ]
+            for future in as_completed(futures):
+                result = future.result() if future.exception() is None else CacheResult(ERROR)
+                if result.status != ERROR:
+                    return result
+            caches = caches[self.replicas:]
 
-    def turn(self) -> None:
+        for cache in caches:
+            result = self.lookup(cache, endpoint, data_json)
+            if result.status != ERROR:
+                return result
+        return CacheResult(ERROR)
+
+    def read_caches(self, text : str) -> list:
         '''
-            This function changes the responsible cache.
+            This function returns the caches a text is read from, in the order they should be tried.
+            The replicas are read first, the next cache on the ring standing in if all of them fail.
+                :param text: str
+                    The text of the message.
         '''
-        self.responsible_cache = [cache for cache in self.caches_list if cache != self.responsible_cache][0]
+        return self.ring.nodes_for(self.routing_key(text), self.replicas + 1)
 
     def get_value(self, text : str, service : str) -> dict:
         '''
-            This function calls the cache of the systems.
-            If the call fails or the cache returns a None then another cache is used.
-            Finally the responsible cache is changed.
+            This function calls the cache owning the text.
+            A miss is returned at once, the next cache on the ring being used only if the owner fails.
                 :param text: str
                     The text of the message.
                 :param service: str
                     The name of the service to check the cache for.
         '''
+        # Checking the in-process cache first.
+        if self.local_cache is not None:
+            prediction = self.local_cache.get(text, service)
+            if prediction is not None:
+                return prediction
+
         # Creation of the request body.
         data_json = {
             "text" : text,
             "service" : service
         }
-        # Generation of the HMAC for the cache.
-        hmac = self.security_managers[self.responsible_cache]._SecurityManager__encode_hmac(data_json)
+        # Looking the text up, a failing cache being replaced by the next one.
+        result = self.first_answer(self.read_caches(text), "cache", data_json)
+        if result.status == HIT:
+            return self.store(text, service, result.body["prediction"])
+        return None
 
-        # Requesting the Cache.
-        response = requests.get(
-            f"http://{self.caches[self.responsible_cache]['general']['host']}:{self.caches[self.responsible_cache]['general']['port']}/cache",
-            json = data_json,
-            headers = {"Token" : hmac}
-        )
-
-        # Checking if the request was successful.
-        if response.status_code == 200:
-            # Turning the responsible cache and returning the result.
-            self.turn()
-            return response.json()["prediction"]
+    def get_values(self, text : str, services : list) -> dict:
+        '''
+            This function gets the predictions of several services for a text in one request to its owner.
+            The misses are returned at once, the next cache on the ring being used only if the owner fails.
+                :param text: str
+                    The text of the message.
+                :param services: list
+                    The names of the services to check the cache for.
+                :return: dict
+                    The mapping of every service to its cached prediction, None meaning a miss.
+        '''
+        # Serving from the in-process cache the predictions it holds.
+        results = {}
+        if self.local_cache is not None:
+            for service in services:
+                prediction = self.local_cache.get(text, service)
+                if prediction is not None:
+                    results[service] = prediction
+            if len(results) == len(services):
+                return results
+        services = [service for service in services if service not in results]
+
+        # Creation of the request body.
+        data_json = {
+            "text" : text,
+            "services" : services
+        }
+        # Looking the text up, a failing cache being replaced by the next one.
+        result = self.first_answer(self.read_caches(text), "cache_batch", data_json)
+        if result.status == HIT:
+            predictions = result.body["predictions"]
+            for service in services:
+                results[service] = self.store(text, service, predictions.get(service))
+        elif result.status == UNSUPPORTED:
+            # The cache doesn't serve batched lookups, so the services are looked up one by one.
+            for service in services:
+                results[service] = self.get_value(text, service)
         else:
-            # If the request to the first cache fails, then the second cache is tried.
-            other_cache = [cache for cache in self.caches_list if cache != self.responsible_cache][0]
-
-            # Generation of the HMAC for the cache.
-            hmac = self.security_managers[other_cache]._SecurityManager__encode_hmac(data_json)
-
-            # Requesting the Cache.
-            response = requests.get(
-                f"http://{self.caches[other_cache]['general']['host']}:{self.caches[other_cache]['general']['port']}/cache",
-                json = data_json,
-                headers = {"Token" : hmac}
-            )
-
-            # Turning the responsible cache and returning the result.
-            self.turn()
-            if response.status_code == 200:
-                return response.json()["prediction"]
-            else:
-                return None
\ No newline at end of file
+            # Reporting the remaining services as misses.
+            for service in services:
+                results[service] = None
+        return results
+
+    def store(self, text : str, service : str, prediction):
+        '''
+            This function fills the in-process cache with a prediction.
+                :param text: str
+                    The text of the message.
+                :param service: str
+                    The name of the service that made the prediction.
+                :param prediction: any
+                    The prediction of the service.
+                :return: any
+                    The stored prediction.
+        '''
+        if self.local_cache is not None:
+            self.local_cache.set(text, service, prediction)
+        return prediction
+
+    def owners(self, text : str) -> list:
+        '''
+            This function returns the caches that must hold the predictions of a text.
+            The predictions of a text live on its owner and on the following replicas on the ring.
+                :param text: str
+                    The text of the message.
+                :return: list
+                    The names of the caches.
+        '''
+        return self.ring.nodes_for(self.routing_key(text), self.replicas)
+
+    def set_values(self, cache : str, items : list) -> bool:
+        '''
+            This function writes a batch of predictions into one of the caches.
+                :param cache: str
+                    The name of the cache to write into.
+                :param items: list
+                    The list of {"text", "service", "prediction"} dictionaries to store.
+                :return: bool
+                    True if the cache accepted the batch.
+        '''
+        response = self.request_cache(cache, "cache_batch", {"items" : items}, method="POST")
+        return response is not None and response.status_code == 200
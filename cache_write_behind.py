@@ -0,0 +1,127 @@
+# Importing all needed modules.
+from cache_round_robin import CacheRoundRobin
+import threading
+import queue
+import time
+
+
+class CacheWriteBehind:
+    def __init__(self,
+                 cache_manager : CacheRoundRobin,
+                 batch_size : int = 64,
+                 flush_interval : float = 0.05,
+                 max_queue : int = 10000) -> None:
+        '''
+            The constructor of the Cache Write Behind.
+                :param cache_manager: CacheRoundRobin
+                    The cache manager used to write the predictions into the caches.
+                :param batch_size: int, default = 64
+                    The maximal number of predictions sent in one request to a cache.
+                :param flush_interval: float, default = 0.05
+                    The maximal number of seconds a prediction waits before being sent.
+                :param max_queue: int, default = 10000
+                    The maximal number of pending predictions, the new ones being dropped past it.
+        '''
+        # Setting up the class fields.
+        self.cache_manager = cache_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        # Setting up the counters of the writer, updated by the request threads and the writer thread.
+        self.counters_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+        # Starting the thread writing the predictions.
+        self.thread = threading.Thread(target=self.run, name="cache-write-behind", daemon=True)
+        self.thread.start()
+
+    def put(self, text : str, service : str, prediction) -> bool:
+        '''
+            This function schedules the write of a prediction without blocking.
+                :param text: str
+                    The text of the message.
+                :param service: str
+                    The name of the service that made the prediction.
+                :param prediction: any
+                    The prediction of the service.
+                :return: bool
+                    False if the prediction was dropped because the queue is full.
+        '''
+        try:
+            self.queue.put_nowait({"text" : text, "service" : service, "prediction" : prediction})
+            return True
+        except queue.Full:
+            with self.counters_lock:
+                self.dropped += 1
+            return False
+
+    def next_batch(self) -> list:
+        '''
+            This function waits for the next batch of predictions.
+            The batch is closed when it is full or when the flush interval passed since its first item.
+                :return: list
+                    The predictions to write.
+        '''
+        batch = [self.queue.get()]
+        flush_at = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = flush_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def write(self, batch : list) -> None:
+        '''
+            This function writes a batch of predictions into the caches owning their texts.
+                :param batch: list
+                    The predictions to write.
+        '''
+        # Grouping the predictions by the cache they must be written into.
+        cache_batches = {}
+        for item in batch:
+            for cache in self.cache_manager.owners(item["text"]):
+                cache_batches.setdefault(cache, []).append(item)
+
+        # Sending one request per cache.
+        for cache in cache_batches:
+            is_written = self.cache_manager.set_values(cache, cache_batches[cache])
+            with self.counters_lock:
+                if is_written:
+                    self.written += len(cache_batches[cache])
+                else:
+                    self.failed += len(cache_batches[cache])
+
+    def run(self) -> None:
+        '''
+            This function writes the scheduled predictions batch by batch.
+        '''
+        while True:
+            batch = self.next_batch()
+            try:
+                self.write(batch)
+            except Exception as err:
+                # A failed batch must not stop the writer.
+                with self.counters_lock:
+                    self.failed += len(batch)
+                print(f"Cache write behind failed - {err}")
+
+    def stats(self) -> dict:
+        '''
+            This function returns the counters of the writer.
+                :return: dict
+                    The pending, written, dropped and failed predictions counts.
+        '''
+        with self.counters_lock:
+            return {
+                "pending" : self.queue.qsize(),
+                "written" : self.written,
+                "dropped" : self.dropped,
+                "failed" : self.failed
+            }
@@ -1,8 +1,9 @@
 # Importing all needed libraries.
-import json
 import hmac
 import hashlib
 
+from codec import codec
+
 
 class SecurityManager:
     def __init__(self, key : str) -> None:
@@ -13,6 +14,22 @@ class SecurityManager:
         '''
         self.key = str.encode(key)
 
+        # The keyed HMAC, copied for every message instead of being keyed again.
+        self.keyed_hmac = hmac.new(self.key, digestmod=hashlib.sha256)
+
+    def sign(self, body : bytes) -> str:
+        '''
+            This function calculates the HMAC of the raw request body and returns it.
+                :param body: bytes
+                    The raw body of the request.
+                :return: str
+                    The HMAC of the request body.
+        '''
+        body_hmac = self.keyed_hmac.copy()
+        body_hmac.update(body)
+
+        return body_hmac.hexdigest()
+
     def __encode_hmac(self, request_body) -> str:
         '''
             This function calculates the HMAC of the request body and returns it.
@@ -21,27 +38,38 @@ class SecurityManager:
                 :return json_hmac: str
                     The HMAC of the request body.
         '''
-        request_body_binary = json.dumps(request_body).encode()
-        json_hmac = hmac.new(self.key, request_body_binary, hashlib.sha256).hexdigest()
+        return self.sign(codec.wire_dumps(request_body))
+
+    def sign_request(self, request_body : dict, binary : bool = False) -> tuple:
+        '''
+            This function serializes the request body once and signs the serialized bytes.
+                :param request_body: dict
+                    The body of the request.
+                :param binary: bool, default = False
+                    True if the receiver accepts the binary transport of the codec.
+                :return: tuple
+                    The raw body to send and the headers carrying its HMAC.
+        '''
+        body, content_type = codec.encode(request_body, binary)
 
-        return json_hmac
+        return body, {"Token" : self.sign(body), "Content-Type" : content_type}
 
-    def verify(self, token : str, request_body : dict) -> bool:
+    def verify(self, token : str, request_body) -> bool:
         '''
             This function authenticates the request body.
                 :param token: str
                     The token sent with the request from the headers.
-                :param request_body: dict
-                    The body of the request.
+                :param request_body: bytes or dict
+                    The raw body of the request, or its parsed JSON.
         '''
-        # Compuiting the HMAC o the request body.
-        request_hmac = self.__encode_hmac(request_body)
-
-        # Verifying the request HMAC.
-        if token == request_hmac:
-            return True
+        # Computing the HMAC of the request body.
+        if isinstance(request_body, (bytes, bytearray)):
+            request_hmac = self.sign(request_body)
         else:
-            return False
+            request_hmac = self.__encode_hmac(request_body)
+
+        # Verifying the request HMAC in constant time.
+        return hmac.compare_digest(token.encode(), request_hmac.encode())
 
     def check_access_token(self, header_dict : dict):
         '''
@@ -66,7 +94,7 @@ class SecurityManager:
 
         if check_response != "OK":
             return check_response
-        elif not self.verify(request.headers["token"], request.json):
+        elif not self.verify(request.headers["token"], request.get_data(cache=True)):
             # If the request didn't passed the HMAC authentication a 401 status error code is returned.
             return {
                 "message" : "401 Unauthorized",
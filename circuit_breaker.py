@@ -0,0 +1,146 @@
+# Importing all needed modules.
+from collections import deque
+import threading
+import time
+
+# The states of a circuit breaker.
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self,
+                 failure_rate : float = 0.5,
+                 slow_call_duration : float = 1.0,
+                 slow_call_rate : float = 0.8,
+                 window_size : int = 20,
+                 min_calls : int = 10,
+                 open_duration : float = 5.0,
+                 half_open_probes : int = 3) -> None:
+        '''
+            The constructor of the Circuit Breaker of a service.
+                :param failure_rate: float, default = 0.5
+                    The share of failed calls of the window opening the circuit.
+                :param slow_call_duration: float, default = 1.0
+                    The number of seconds above which a call is counted as slow.
+                :param slow_call_rate: float, default = 0.8
+                    The share of slow calls of the window opening the circuit.
+                :param window_size: int, default = 20
+                    The number of the last calls the rates are computed over.
+                :param min_calls: int, default = 10
+                    The number of calls needed in the window before the circuit can open.
+                :param open_duration: float, default = 5.0
+                    The number of seconds the circuit stays open before letting probes through.
+                :param half_open_probes: int, default = 3
+                    The number of successful probes closing the circuit, a failed one opening it again.
+        '''
+        # Setting up the thresholds of the breaker.
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self.half_open_probes = half_open_probes
+
+        # The (failed, slow) outcomes of the last calls.
+        self.window = deque(maxlen=window_size)
+        self.state = CLOSED
+        # The generation changes with the state, so the outcome of a call allowed in a former state is ignored.
+        self.generation = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probes_succeeded = 0
+        self.lock = threading.Lock()
+
+        # Setting up the counters of the breaker.
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self) -> tuple:
+        '''
+            This function decides if a call can be made.
+                :return: tuple
+                    The (state, generation) token of the allowed call, to be passed to record, a half open
+                    state marking a probe. None if the circuit is open or all the probes of the half open
+                    circuit are in flight.
+        '''
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_duration:
+                # Letting the probes through once the circuit was open long enough.
+                self.state = HALF_OPEN
+                self.generation += 1
+                self.probes_in_flight = 0
+                self.probes_succeeded = 0
+
+            if self.state == CLOSED:
+                return (CLOSED, self.generation)
+            elif self.state == HALF_OPEN and self.probes_in_flight < self.half_open_probes:
+                self.probes_in_flight += 1
+                return (HALF_OPEN, self.generation)
+            self.rejected += 1
+            return None
+
+    def record(self, token : tuple, succeeded : bool, duration : float) -> None:
+        '''
+            This function records the outcome of an allowed call.
+                :param token: tuple
+                    The token given by allow for the call.
+                :param succeeded: bool
+                    True if the service answered successfully.
+                :param duration: float
+                    The number of seconds the call took.
+        '''
+        slow = duration > self.slow_call_duration
+        state, generation = token
+        with self.lock:
+            if generation != self.generation:
+                # The call was allowed before the circuit changed its state, ex: a call allowed while closed
+                # finishing once the circuit is half open isn't a probe.
+                return
+
+            if state == HALF_OPEN:
+                self.probes_in_flight -= 1
+                if not succeeded or slow:
+                    self.trip()
+                else:
+                    self.probes_succeeded += 1
+                    if self.probes_succeeded >= self.half_open_probes:
+                        # Closing the circuit with a fresh window.
+                        self.state = CLOSED
+                        self.generation += 1
+                        self.window.clear()
+                return
+
+            self.window.append((not succeeded, slow))
+            if len(self.window) >= self.min_calls:
+                failed_calls = sum(outcome[0] for outcome in self.window)
+                slow_calls = sum(outcome[1] for outcome in self.window)
+                if failed_calls >= self.failure_rate * len(self.window) or slow_calls >= self.slow_call_rate * len(self.window):
+                    self.trip()
+
+    def trip(self) -> None:
+        '''
+            This function opens the circuit, the lock being held by the caller.
+        '''
+        self.state = OPEN
+        self.generation += 1
+        self.opened_at = time.monotonic()
+        self.opened += 1
+        self.window.clear()
+
+    def stats(self) -> dict:
+        '''
+            This function returns the state and the counters of the breaker.
+                :return: dict
+                    The state, the failure and slow rates of the window, and the rejected calls and openings counts.
+        '''
+        with self.lock:
+            calls = len(self.window)
+            return {
+                "state" : self.state,
+                "failure_rate" : sum(outcome[0] for outcome in self.window) / calls if calls else 0.0,
+                "slow_call_rate" : sum(outcome[1] for outcome in self.window) / calls if calls else 0.0,
+                "rejected" : self.rejected,
+                "opened" : self.opened
+            }
@@ -0,0 +1,126 @@
+# Importing all needed modules.
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# The content types of the encoded bodies.
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+
+def stdlib_dumps(obj) -> bytes:
+    '''
+        This function encodes an object with the standard library, byte for byte as json.dumps.
+    '''
+    return json.dumps(obj).encode()
+
+# The available JSON backends as (dumps, loads) pairs, dumps returning bytes.
+JSON_BACKENDS = {"json" : (stdlib_dumps, json.loads)}
+if orjson is not None:
+    JSON_BACKENDS["orjson"] = (lambda obj : orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS), orjson.loads)
+if msgspec is not None:
+    JSON_BACKENDS["msgspec"] = (msgspec.json.Encoder().encode, msgspec.json.Decoder().decode)
+
+# The available MessagePack backend, msgspec being preferred.
+if msgspec is not None:
+    MSGPACK_BACKEND = (msgspec.msgpack.Encoder().encode, msgspec.msgpack.Decoder().decode)
+elif msgpack is not None:
+    MSGPACK_BACKEND = (lambda obj : msgpack.packb(obj, use_bin_type=True), lambda data : msgpack.unpackb(data, raw=False))
+else:
+    MSGPACK_BACKEND = None
+
+
+class Codec:
+    def __init__(self, backend : str = "json", wire_backend : str = "json", binary_transport : bool = False) -> None:
+        '''
+            The constructor of the Codec shared by the services.
+                :param backend: str, default = "json"
+                    The JSON backend used for decoding and for the bodies kept in process or in the database.
+                :param wire_backend: str, default = "json"
+                    The JSON backend used for the signed bodies sent to the other services.
+                :param binary_transport: bool, default = False
+                    True to send the internal sidecar and cache requests as MessagePack.
+        '''
+        self.configure(backend, wire_backend, binary_transport)
+
+    def configure(self, backend : str = "json", wire_backend : str = "json", binary_transport : bool = False) -> None:
+        '''
+            This function switches the backends of the codec.
+            The other services verify the HMAC over json.dumps of the parsed body, so the wire backend
+            must stay "json" unless every receiver verifies the raw bytes.
+                :param backend: str, default = "json"
+                    The JSON backend used for decoding and for the bodies kept in process or in the database.
+                :param wire_backend: str, default = "json"
+                    The JSON backend used for the signed bodies sent to the other services.
+                :param binary_transport: bool, default = False
+                    True to send the internal sidecar and cache requests as MessagePack.
+        '''
+        for name in (backend, wire_backend):
+            if name not in JSON_BACKENDS:
+                raise ValueError(f"The JSON backend {name} isn't available, the available ones are {', '.join(JSON_BACKENDS)}!")
+        if binary_transport and MSGPACK_BACKEND is None:
+            raise ValueError("The binary transport requires msgspec or msgpack to be installed!")
+
+        self.backend = backend
+        self.wire_backend = wire_backend
+        self.binary_transport = bool(binary_transport)
+        self.dumps, self.loads = JSON_BACKENDS[backend]
+        self.wire_dumps = JSON_BACKENDS[wire_backend][0]
+
+    def dumps_str(self, obj) -> str:
+        '''
+            This function encodes an object as a JSON string.
+        '''
+        return self.dumps(obj).decode()
+
+    def encode(self, obj, binary : bool = False) -> tuple:
+        '''
+            This function encodes the body of a request to another service.
+                :param obj: any
+                    The body of the request.
+                :param binary: bool, default = False
+                    True if the receiver accepts MessagePack, used only when the binary transport is enabled.
+                :return: tuple
+                    The encoded body and its content type.
+        '''
+        if binary and self.binary_transport:
+            return MSGPACK_BACKEND[0](obj), MSGPACK_CONTENT_TYPE
+        return self.wire_dumps(obj), JSON_CONTENT_TYPE
+
+    def decode(self, data : bytes, content_type : str = None):
+        '''
+            This function decodes a body according to its content type.
+                :param data: bytes
+                    The encoded body.
+                :param content_type: str, default = None
+                    The content type of the body, JSON if None.
+        '''
+        if content_type and content_type.startswith(MSGPACK_CONTENT_TYPE):
+            if MSGPACK_BACKEND is None:
+                raise ValueError("Decoding MessagePack requires msgspec or msgpack to be installed!")
+            return MSGPACK_BACKEND[1](data)
+        return self.loads(data)
+
+    def decode_response(self, response):
+        '''
+            This function decodes the body of a response of another service.
+                :param response: requests.Response
+                    The response to decode.
+        '''
+        return self.decode(response.content, response.headers.get("Content-Type"))
+
+
+# The codec shared by all the modules, configured once at start-up.
+codec = Codec()
@@ -0,0 +1,161 @@
+# Importing all needed modules.
+from collections import OrderedDict, deque
+import threading
+
+
+class ConversationTurn:
+    # Keeping the turns compact as many of them are held in memory.
+    __slots__ = ("text", "intent", "state", "date")
+
+    def __init__(self, text : str, intent : str, state : str, date : float) -> None:
+        '''
+            The constructor of a Conversation Turn.
+                :param text: str
+                    The text of the message.
+                :param intent: str
+                    The intent of the message.
+                :param state: str
+                    The state of the dialog after the message.
+                :param date: float
+                    The timestamp of the message.
+        '''
+        self.text = text
+        self.intent = intent
+        self.state = state
+        self.date = date
+
+
+class ConversationRecord:
+    __slots__ = ("state", "turns")
+
+    def __init__(self, state : str, turns : deque) -> None:
+        '''
+            The constructor of a Conversation Record.
+                :param state: str
+                    The current state of the dialog.
+                :param turns: deque
+                    The last turns of the conversation, from the oldest to the newest.
+        '''
+        self.state = state
+        self.turns = turns
+
+
+class ConversationStore:
+    def __init__(self, loader, max_users : int = 100000, max_turns : int = 5, default_state : str = "ANY") -> None:
+        '''
+            The constructor of the Conversation Store.
+            The states are written through the memory of the process, so the Dialog Manager must run as a single
+            process (threads only): another process answering the same user would read a stale state.
+                :param loader: callable
+                    The function loading the last turns of a user from the Data Base.
+                    It is called as loader(user_id, max_turns) and returns the ConversationTurn
+                    list from the oldest to the newest.
+                :param max_users: int, default = 100000
+                    The maximal number of conversations held in memory.
+                :param max_turns: int, default = 5
+                    The number of turns kept per conversation.
+                :param default_state: str, default = "ANY"
+                    The state of a conversation without any message.
+        '''
+        # Setting up the class fields.
+        self.loader = loader
+        self.max_users = max_users
+        self.max_turns = max_turns
+        self.default_state = default_state
+
+        # The conversations are kept from the least to the most recently used.
+        self.records = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Setting up the counters of the store.
+        self.hits = 0
+        self.loads = 0
+
+    def put(self, user_id : str, record : ConversationRecord) -> None:
+        '''
+            This function stores the conversation record, evicting the least recently used ones.
+                :param user_id: str
+                    The id of the user.
+                :param record: ConversationRecord
+                    The conversation of the user.
+        '''
+        self.records[user_id] = record
+        self.records.move_to_end(user_id)
+        while len(self.records) > self.max_users:
+            self.records.popitem(last=False)
+
+    def get(self, user_id : str) -> ConversationRecord:
+        '''
+            This function returns the conversation of the user, loading it from the Data Base on a miss.
+                :param user_id: str
+                    The id of the user.
+                :return: ConversationRecord
+                    The conversation of the user.
+        '''
+        with self.lock:
+            record = self.records.get(user_id)
+            if record is not None:
+                self.records.move_to_end(user_id)
+                self.hits += 1
+                return record
+
+        # Loading the last turns of the user outside of the lock.
+        turns = deque(self.loader(user_id, self.max_turns), maxlen=self.max_turns)
+        record = ConversationRecord(turns[-1].state if turns else self.default_state, turns)
+        with self.lock:
+            self.loads += 1
+            # Keeping the record written by a concurrent message if there is one.
+            if user_id in self.records:
+                return self.records[user_id]
+            self.put(user_id, record)
+        return record
+
+    def get_state(self, user_id : str) -> str:
+        '''
+            This function returns the current state of the conversation of the user.
+                :param user_id: str
+                    The id of the user.
+                :return: str
+                    The state of the dialog.
+        '''
+        return self.get(user_id).state
+
+    def record(self, user_id : str, turn : ConversationTurn) -> None:
+        '''
+            This function writes a committed turn through the store.
+                :param user_id: str
+                    The id of the user.
+                :param turn: ConversationTurn
+                    The committed turn of the conversation.
+        '''
+        with self.lock:
+            record = self.records.get(user_id)
+            if record is None:
+                # The conversation isn't loaded, so it is started from this turn as it holds the current state.
+                self.put(user_id, ConversationRecord(turn.state, deque([turn], maxlen=self.max_turns)))
+                return
+            record.turns.append(turn)
+            record.state = turn.state
+            self.records.move_to_end(user_id)
+
+    def invalidate(self, user_id : str) -> None:
+        '''
+            This function drops the conversation of the user from memory.
+                :param user_id: str
+                    The id of the user.
+        '''
+        with self.lock:
+            self.records.pop(user_id, None)
+
+    def stats(self) -> dict:
+        '''
+            This function returns the counters of the store.
+                :return: dict
+                    The conversations count, hits and loads counters.
+        '''
+        with self.lock:
+            return {
+                "conversations" : len(self.records),
+                "hits" : self.hits,
+                "loads" : self.loads
+            }
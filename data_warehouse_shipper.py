@@ -0,0 +1,255 @@
+# Importing all needed modules.
+from http_client import HttpClient
+from metrics import metrics
+from codec import codec
+import threading
+import requests
+import atexit
+import queue
+import time
+import os
+
+# Declaring the metrics of the sinks.
+metrics.histogram("dialog_manager_sink_request_seconds", "The duration of the requests to the Data Warehouse and the Telegram Interface.")
+
+
+class DataWarehouseShipper:
+    def __init__(self,
+                 data_warehouse_data : dict,
+                 http_client : HttpClient = None,
+                 batch_size : int = 100,
+                 flush_interval : float = 1.0,
+                 max_retries : int = 3,
+                 backoff : float = 0.5,
+                 max_queue : int = 100000,
+                 spool_path : str = "data_warehouse_spool.jsonl") -> None:
+        '''
+            The constructor of the Data Warehouse Shipper.
+                :param data_warehouse_data: dict
+                    The credentials of the Data Warehouse (host, port and security manager).
+                :param http_client: HttpClient, default = None
+                    The shared HTTP client used to call the Data Warehouse.
+                :param batch_size: int, default = 100
+                    The maximal number of events sent in one request.
+                :param flush_interval: float, default = 1.0
+                    The maximal number of seconds an event waits before being sent.
+                :param max_retries: int, default = 3
+                    The number of retries of a failed batch before it is spooled.
+                :param backoff: float, default = 0.5
+                    The number of seconds before the first retry, doubled at every retry.
+                :param max_queue: int, default = 100000
+                    The maximal number of pending events, the new ones being spooled past it.
+                :param spool_path: str, default = "data_warehouse_spool.jsonl"
+                    The path of the append-only file keeping the events that couldn't be sent.
+        '''
+        # Setting up the class fields.
+        self.data_warehouse_data = data_warehouse_data
+        self.http_client = http_client if http_client is not None else HttpClient()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.spool_path = spool_path
+        self.replaying_path = spool_path + ".replaying"
+        self.spool_lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        # Setting up the counters of the shipper, updated by the request threads and the shipper thread.
+        self.counters_lock = threading.Lock()
+        self.shipped = 0
+        self.requests_count = 0
+        self.retries = 0
+        self.spooled = 0
+        for path in (self.spool_path, self.replaying_path):
+            if os.path.exists(path):
+                with open(path, "r") as spool_file:
+                    self.spooled += sum(1 for line in spool_file if line.strip())
+
+        # Starting the thread shipping the events.
+        self.thread = threading.Thread(target=self.run, name="data-warehouse-shipper", daemon=True)
+        self.thread.start()
+
+        # Shipping or spooling the pending events when the process exits.
+        atexit.register(self.drain)
+
+    def ship(self, kind : str, payload : dict) -> None:
+        '''
+            This function schedules an event to be sent to the Data Warehouse without blocking.
+                :param kind: str
+                    The kind of the event ("message" or "user").
+                :param payload: dict
+                    The fact of the event.
+        '''
+        event = {"kind" : kind, "payload" : payload}
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.spool([event])
+
+    def next_batch(self) -> list:
+        '''
+            This function waits for the next batch of events.
+            The batch is closed when it is full or when the flush interval passed since its first event.
+                :return: list
+                    The events to send.
+        '''
+        batch = [self.queue.get()]
+        flush_at = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = flush_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def send(self, batch : list) -> bool:
+        '''
+            This function sends a batch of events to the bulk endpoint of the Data Warehouse.
+                :param batch: list
+                    The events to send.
+                :return: bool
+                    True if the Data Warehouse accepted the batch.
+        '''
+        data_json = {"events" : batch}
+
+        # Serializing the batch once and signing the sent bytes.
+        body, headers = self.data_warehouse_data["security_manager"].sign_request(data_json)
+
+        # Making the request to the Data Warehouse.
+        with self.counters_lock:
+            self.requests_count += 1
+        try:
+            with metrics.timer("dialog_manager_sink_request_seconds", sink="data_warehouse"):
+                response = self.http_client.post(
+                    f"http://{self.data_warehouse_data['host']}:{self.data_warehouse_data['port']}/bulk",
+                    data = body,
+                    headers = headers
+                )
+        except requests.RequestException:
+            return False
+        return response.status_code == 200
+
+    def send_with_retries(self, batch : list) -> bool:
+        '''
+            This function sends a batch of events, retrying with an exponential backoff.
+                :param batch: list
+                    The events to send.
+                :return: bool
+                    True if the batch was sent.
+        '''
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                with self.counters_lock:
+                    self.retries += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            if self.send(batch):
+                with self.counters_lock:
+                    self.shipped += len(batch)
+                return True
+        return False
+
+    def spool(self, batch : list) -> None:
+        '''
+            This function appends the events to the spool file.
+                :param batch: list
+                    The events that couldn't be sent.
+        '''
+        with self.spool_lock:
+            with open(self.spool_path, "a") as spool_file:
+                for event in batch:
+                    spool_file.write(codec.dumps_str(event) + "\n")
+        with self.counters_lock:
+            self.spooled += len(batch)
+
+    def replay_spool(self) -> None:
+        '''
+            This function sends the spooled events once the Data Warehouse is reachable again.
+            The spool file is renamed while it is replayed and only deleted once every batch was accepted,
+            so a crash during the replay keeps the events (they may then be sent twice).
+            The events that still can't be sent are spooled back.
+        '''
+        # Taking over the spooled events, a replay interrupted by a crash being resumed first.
+        with self.spool_lock:
+            if not os.path.exists(self.replaying_path):
+                if not os.path.exists(self.spool_path):
+                    return
+                os.replace(self.spool_path, self.replaying_path)
+            with open(self.replaying_path, "r") as spool_file:
+                events = [codec.loads(line) for line in spool_file if line.strip()]
+
+        # Sending the spooled events batch by batch.
+        for start in range(0, len(events), self.batch_size):
+            batch = events[start : start + self.batch_size]
+            if not self.send(batch):
+                self.spool(events[start:])
+                break
+            with self.counters_lock:
+                self.shipped += len(batch)
+
+        # Deleting the replayed file, its unsent events being back in the spool.
+        with self.spool_lock:
+            os.remove(self.replaying_path)
+        with self.counters_lock:
+            self.spooled -= len(events)
+
+    def drain(self) -> None:
+        '''
+            This function ships the pending events when the process exits, spooling the ones that can't be sent.
+        '''
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(batch), self.batch_size):
+            events = batch[start : start + self.batch_size]
+            try:
+                sent = self.send(events)
+            except Exception:
+                sent = False
+            if not sent:
+                self.spool(batch[start:])
+                return
+            with self.counters_lock:
+                self.shipped += len(events)
+
+    def run(self) -> None:
+        '''
+            This function ships the scheduled events batch by batch.
+        '''
+        while True:
+            batch = self.next_batch()
+            try:
+                if not self.send_with_retries(batch):
+                    self.spool(batch)
+                    continue
+            except Exception as err:
+                # A failed batch must not stop the shipper.
+                print(f"Data Warehouse shipper failed - {err}")
+                self.spool(batch)
+                continue
+
+            # The Data Warehouse is up, so the spooled events are sent too.
+            try:
+                self.replay_spool()
+            except Exception as err:
+                print(f"Data Warehouse spool replay failed - {err}")
+
+    def stats(self) -> dict:
+        '''
+            This function returns the counters of the shipper.
+                :return: dict
+                    The pending, shipped, spooled events counts and the requests and retries counts.
+        '''
+        with self.counters_lock:
+            return {
+                "pending" : self.queue.qsize(),
+                "shipped" : self.shipped,
+                "spooled" : self.spooled,
+                "requests" : self.requests_count,
+                "retries" : self.retries
+            }
@@ -1,4 +1,7 @@
 from .dialog_manager import DialogManager
 from .full_state_request import FullStateRequests
 from .phrase_formater import PhraseFormatter
-from .random_phrase import RandomPhrase
\ No newline at end of file
+from .random_phrase import RandomPhrase
+from .fsm_engine import CompiledFSM
+from .dialog_graph import DialogGraph, DialogGraphRegistry
+from .date_normalizer import DateNormalizer
\ No newline at end of file
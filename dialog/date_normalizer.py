@@ -0,0 +1,162 @@
+# Importing all needed modules.
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from dateutil import parser
+import re
+
+
+class DateNormalizer:
+    # The output format of the normalized dates.
+    DATE_FORMAT = "%d-%m-%Y"
+
+    # The days relative to today named by a single word.
+    RELATIVE_DAYS = {
+        "today" : 0,
+        "tonight" : 0,
+        "now" : 0,
+        "tomorrow" : 1,
+        "yesterday" : -1,
+        "day after tomorrow" : 2,
+        "the day after tomorrow" : 2,
+        "day before yesterday" : -2,
+        "the day before yesterday" : -2
+    }
+
+    WEEKDAYS = {
+        "monday" : 0, "mon" : 0,
+        "tuesday" : 1, "tue" : 1, "tues" : 1,
+        "wednesday" : 2, "wed" : 2,
+        "thursday" : 3, "thu" : 3, "thurs" : 3,
+        "friday" : 4, "fri" : 4,
+        "saturday" : 5, "sat" : 5,
+        "sunday" : 6, "sun" : 6
+    }
+
+    MONTHS = {
+        "january" : 1, "jan" : 1,
+        "february" : 2, "feb" : 2,
+        "march" : 3, "mar" : 3,
+        "april" : 4, "apr" : 4,
+        "may" : 5,
+        "june" : 6, "jun" : 6,
+        "july" : 7, "jul" : 7,
+        "august" : 8, "aug" : 8,
+        "september" : 9, "sep" : 9, "sept" : 9,
+        "october" : 10, "oct" : 10,
+        "november" : 11, "nov" : 11,
+        "december" : 12, "dec" : 12
+    }
+
+    UNIT_DAYS = {"day" : 1, "days" : 1, "week" : 7, "weeks" : 7}
+
+    # Compiling the patterns of the fast path.
+    WEEKDAY_PATTERN = re.compile(r"(?:(this|next|last|on)\s+)?(" + "|".join(WEEKDAYS) + r")")
+    OFFSET_PATTERN = re.compile(r"(?:in\s+(\d+|a|one)\s+(days?|weeks?)|(\d+|a|one)\s+(days?|weeks?)\s+ago|(next|last)\s+(week))")
+    ISO_PATTERN = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+    DAY_MONTH_PATTERN = re.compile(r"(?:the\s+)?(\d{1,2})(?:st|nd|rd|th)?(?:\s+of)?\s+(" + "|".join(MONTHS) + r")\.?(?:,?\s+(\d{4}))?")
+    MONTH_DAY_PATTERN = re.compile(r"(" + "|".join(MONTHS) + r")\.?\s+(?:the\s+)?(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?")
+
+    def __init__(self, max_cache : int = 4096) -> None:
+        '''
+            The constructor of the Date Normalizer.
+                :param max_cache: int, default = 4096
+                    The maximal number of (date string, day) pairs memoized.
+        '''
+        # Memoizing the normalization, the day being part of the key as relative dates change with it.
+        self.cached_normalize = lru_cache(maxsize=max_cache)(self.compute)
+
+    def fast_path(self, date_string : str, today : date) -> date:
+        '''
+            This function converts the common date expressions without dateutil.
+                :param date_string: str
+                    The lower-cased and stripped date string.
+                :param today: date
+                    The current day.
+                :return: date
+                    The date or None if the string isn't a common expression.
+        '''
+        if date_string in self.RELATIVE_DAYS:
+            return today + timedelta(days=self.RELATIVE_DAYS[date_string])
+
+        match = self.WEEKDAY_PATTERN.fullmatch(date_string)
+        if match:
+            modifier, weekday = match.group(1), self.WEEKDAYS[match.group(2)]
+            days_ahead = (weekday - today.weekday()) % 7
+            if modifier == "next":
+                # The first such weekday after today.
+                return today + timedelta(days=days_ahead or 7)
+            elif modifier == "last":
+                # The last such weekday before today.
+                return today - timedelta(days=(today.weekday() - weekday) % 7 or 7)
+            # The weekday on or after today, as dateutil does.
+            return today + timedelta(days=days_ahead)
+
+        match = self.OFFSET_PATTERN.fullmatch(date_string)
+        if match:
+            if match.group(5):
+                return today + timedelta(days=7 if match.group(5) == "next" else -7)
+            count, unit, sign = (match.group(1), match.group(2), 1) if match.group(1) else (match.group(3), match.group(4), -1)
+            count = 1 if count in ("a", "one") else int(count)
+            return today + timedelta(days=sign * count * self.UNIT_DAYS[unit])
+
+        match = self.ISO_PATTERN.fullmatch(date_string)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+        match = self.DAY_MONTH_PATTERN.fullmatch(date_string)
+        if match:
+            year = int(match.group(3)) if match.group(3) else today.year
+            return date(year, self.MONTHS[match.group(2)], int(match.group(1)))
+
+        match = self.MONTH_DAY_PATTERN.fullmatch(date_string)
+        if match:
+            year = int(match.group(3)) if match.group(3) else today.year
+            return date(year, self.MONTHS[match.group(1)], int(match.group(2)))
+        return None
+
+    def compute(self, date_string : str, today_ordinal : int) -> str:
+        '''
+            This function converts a date string into the %d-%m-%Y format.
+            The fast path is tried first and dateutil is the last resort.
+                :param date_string: str
+                    The lower-cased and stripped date string.
+                :param today_ordinal: int
+                    The ordinal of the current day.
+                :return: str
+                    The date in the %d-%m-%Y format.
+        '''
+        today = date.fromordinal(today_ordinal)
+        try:
+            result = self.fast_path(date_string, today)
+        except ValueError:
+            # Impossible dates (ex: 31 of february) are left to dateutil to reject.
+            result = None
+        if result is None:
+            result = parser.parse(date_string, default=datetime.combine(today, time()))
+        return result.strftime(self.DATE_FORMAT)
+
+    def normalize(self, date_string : str) -> str:
+        '''
+            This function converts multiple types of dates into the format: %d-%m-%Y
+                :param date_string: str
+                    The string representing the point in date.
+                :return: str
+                    The string representing the date in the %d-%m-%Y format.
+        '''
+        return self.cached_normalize(" ".join(date_string.lower().split()), date.today().toordinal())
+
+    def normalize_ners(self, ners : dict) -> dict:
+        '''
+            This function converts all the DATE entities of the named entities dictionary at once.
+                :param ners: dict
+                    The dictionary of the named entities.
+                :return: dict
+                    The dictionary of the named entities with the dates in the %d-%m-%Y format.
+        '''
+        if "DATE" not in ners:
+            return ners
+        today_ordinal = date.today().toordinal()
+        normalize = self.cached_normalize
+        ners = dict(ners)
+        ners["DATE"] = [normalize(" ".join(date_string.lower().split()), today_ordinal) for date_string in ners["DATE"]]
+        return ners
@@ -0,0 +1,221 @@
+# Importing all needed modules.
+from .dialog_manager import DialogManager
+from .full_state_request import FullStateRequests
+from .fsm_engine import CompiledFSM
+import threading
+import json
+import re
+
+
+class DialogGraph:
+    # The ways a state of the dialog can be responded.
+    RESPONDERS = ("full_state", "predefined", "seq2seq")
+
+    def __init__(self, graph : dict, predefined_phrases : dict = None) -> None:
+        '''
+            The constructor of the Dialog Graph.
+            The graph is validated and compiled into a Dialog Manager.
+                :param graph: dict
+                    The declarative dialog graph with the intents and their entity slots,
+                    the states and their responders and the transitions.
+                :param predefined_phrases: dict, default = None
+                    The mapping of states to their predefined phrases, used to check that
+                    every predefined state can be responded.
+        '''
+        # Validating the graph before compiling it.
+        errors = self.validate(graph, predefined_phrases)
+        if errors:
+            raise ValueError("Invalid dialog graph:\n" + "\n".join(f" - {error}" for error in errors))
+
+        # Setting up the fields of the class.
+        self.version = graph["version"]
+        self.initial_state = graph["initial_state"]
+        self.states = {state : graph["states"][state]["responder"] for state in graph["states"]}
+        self.fsm = {
+            (transition["from"], transition["action"]) : transition["to"]
+            for transition in graph["transitions"]
+        }
+
+        # Grouping the states by their responder.
+        self.full_state_list = [state for state in self.states if self.states[state] == "full_state"]
+        self.predefined_states = {state for state in self.states if self.states[state] == "predefined"}
+        self.seq2seq_states = {state for state in self.states if self.states[state] == "seq2seq"}
+
+        # Compiling the graph into the Dialog Manager and the Business Logic requests creator.
+        intents = graph["intents"]
+        self.dialog_manager = DialogManager(
+            self.fsm,
+            accept_date = [intent for intent in intents if "DATE" in intents[intent]],
+            accept_cardinal = [intent for intent in intents if "CARDINAL" in intents[intent]],
+            accept_nouns = [intent for intent in intents if "NOUNS" in intents[intent]],
+            accepted_actions = list(intents),
+            fallback_action = graph["fallback_action"],
+            initial_state = graph["initial_state"]
+        )
+        self.full_state_request_creator = FullStateRequests(self.full_state_list)
+
+    @classmethod
+    def from_file(cls, filename : str, predefined_phrases : dict = None):
+        '''
+            This function loads the dialog graph from a JSON file.
+                :param filename: str
+                    The path to the dialog graph file.
+                :param predefined_phrases: dict, default = None
+                    The mapping of states to their predefined phrases.
+                :return: DialogGraph
+                    The compiled dialog graph.
+        '''
+        with open(filename, "r") as graph_file:
+            return cls(json.load(graph_file), predefined_phrases)
+
+    def validate(self, graph : dict, predefined_phrases : dict = None) -> list:
+        '''
+            This function checks the dialog graph.
+                :param graph: dict
+                    The declarative dialog graph.
+                :param predefined_phrases: dict, default = None
+                    The mapping of states to their predefined phrases.
+                :return: list
+                    The errors found in the graph, empty if the graph is valid.
+        '''
+        if not isinstance(graph, dict):
+            return ["the graph isn't an object"]
+        missing = [key for key in ["version", "initial_state", "fallback_action", "intents", "states", "transitions"]
+                   if key not in graph]
+        if missing:
+            return [f"missing the {key} field" for key in missing]
+
+        # Checking the types of the fields before looking into them.
+        field_types = {
+            "initial_state" : (str, "a string"),
+            "fallback_action" : (str, "a string"),
+            "intents" : (dict, "an object"),
+            "passthrough_intents" : (list, "a list"),
+            "states" : (dict, "an object"),
+            "transitions" : (list, "a list")
+        }
+        errors = [f"the {key} field isn't {name}" for key, (field_type, name) in field_types.items()
+                  if key in graph and not isinstance(graph[key], field_type)]
+        if errors:
+            return errors
+
+        initial_state = graph["initial_state"]
+        intents = graph["intents"]
+        passthrough_intents = graph.get("passthrough_intents", [])
+        states = graph["states"]
+
+        # Checking the entity slots of the intents.
+        for intent in intents:
+            if not isinstance(intents[intent], list):
+                errors.append(f"the slots of the intent {intent} aren't a list")
+                continue
+            for slot in intents[intent]:
+                if slot not in CompiledFSM.SLOTS:
+                    errors.append(f"the intent {intent} expects the unknown slot {slot}")
+
+        # Checking the responders of the states.
+        supported_full_states = FullStateRequests().full_state_list
+        for state in states:
+            if not isinstance(states[state], dict):
+                errors.append(f"the state {state} isn't an object")
+                continue
+            responder = states[state].get("responder")
+            if responder not in self.RESPONDERS:
+                errors.append(f"the state {state} has the unknown responder {responder}")
+            elif responder == "full_state" and state not in supported_full_states:
+                errors.append(f"the state {state} has no Business Logic request")
+            elif responder == "predefined" and predefined_phrases is not None and state not in predefined_phrases:
+                errors.append(f"the state {state} has no predefined phrases")
+
+        # Checking the transitions.
+        transitions = {}
+        for i, transition in enumerate(graph["transitions"]):
+            if not isinstance(transition, dict):
+                errors.append(f"the transition {i} isn't an object")
+                continue
+            missing = [key for key in ["from", "action", "to"] if not isinstance(transition.get(key), str)]
+            if missing:
+                errors.append(f"the transition {i} has no string {', '.join(missing)} field")
+                continue
+            source, action, target = transition["from"], transition["action"], transition["to"]
+            if (source, action) in transitions:
+                errors.append(f"the transition ({source}, {action}) is defined twice")
+            transitions[(source, action)] = target
+            if source != initial_state and source not in states:
+                errors.append(f"the transition ({source}, {action}) starts from an undeclared state")
+            if target not in states:
+                errors.append(f"the transition ({source}, {action}) leads to the undeclared state {target}")
+
+            # Checking that the action can be formed from an intent and its entities.
+            match = re.fullmatch(r"([a-z_]*)(?:\[([A-Z&]+)\])?", action)
+            if match is None:
+                errors.append(f"the action {action} is malformed")
+                continue
+            intent, slots = match.group(1), match.group(2).split("&") if match.group(2) else []
+            if intent and intent not in intents and intent not in passthrough_intents:
+                errors.append(f"the action {action} uses the undeclared intent {intent}")
+            elif intent and slots and not all(slot in intents.get(intent, []) for slot in slots):
+                errors.append(f"the action {action} uses slots the intent {intent} doesn't expect")
+            elif slots != [slot for slot in CompiledFSM.SLOTS if slot in slots]:
+                errors.append(f"the action {action} lists its slots out of the {'&'.join(CompiledFSM.SLOTS)} order")
+            elif not intent and not slots:
+                errors.append("an action is empty")
+
+        # Checking the fallback transition.
+        if (initial_state, graph["fallback_action"]) not in transitions:
+            errors.append(f"the fallback action {graph['fallback_action']} has no transition from {initial_state}")
+
+        # Finding the states reachable from the initial state, the transitions of the
+        # initial state being available from every state.
+        reachable = set()
+        frontier = [target for (source, _), target in transitions.items() if source == initial_state]
+        while frontier:
+            state = frontier.pop()
+            if state in reachable:
+                continue
+            reachable.add(state)
+            frontier.extend(target for (source, _), target in transitions.items() if source == state)
+        for state in states:
+            if state not in reachable:
+                errors.append(f"the state {state} is unreachable")
+        return errors
+
+    def responder(self, state : str) -> str:
+        '''
+            This function returns the responder of a state.
+                :param state: str
+                    The state of the dialog.
+                :return: str
+                    The responder of the state or None if the state isn't declared.
+        '''
+        return self.states.get(state)
+
+
+class DialogGraphRegistry:
+    def __init__(self, filename : str, predefined_phrases : dict = None) -> None:
+        '''
+            The constructor of the Dialog Graph Registry.
+            The registry holds the dialog graph in use and swaps it on reload.
+                :param filename: str
+                    The path to the dialog graph file.
+                :param predefined_phrases: dict, default = None
+                    The mapping of states to their predefined phrases.
+        '''
+        self.filename = filename
+        self.predefined_phrases = predefined_phrases
+        self.reload_lock = threading.Lock()
+        self.current = DialogGraph.from_file(filename, predefined_phrases)
+
+    def reload(self) -> DialogGraph:
+        '''
+            This function loads the dialog graph file again and swaps it in.
+            The requests holding the previous graph finish with it, and if the new graph
+            is invalid the previous one stays in use.
+                :return: DialogGraph
+                    The new dialog graph.
+        '''
+        with self.reload_lock:
+            graph = DialogGraph.from_file(self.filename, self.predefined_phrases)
+            # Swapping the reference is atomic, so no request sees a half loaded graph.
+            self.current = graph
+        return graph
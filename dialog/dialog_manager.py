@@ -1,32 +1,53 @@
 # Importing all needed modules.
-from datetime import datetime, timedelta
-from dateutil import parser
-import re
+from .date_normalizer import DateNormalizer
+from .fsm_engine import CompiledFSM
 
 
 class DialogManager:
-    def __init__(self, fsm) -> None:
+    def __init__(self,
+                 fsm,
+                 accept_date : list = ["get_exercise", "get_meals", "kcals_burned", "kcals_gained"],
+                 accept_cardinal : list = ["update_parameters"],
+                 accept_nouns : list = ["update_parameters", "how_to_make_exercises"],
+                 accepted_actions : list = None,
+                 fallback_action : str = "oos",
+                 initial_state : str = "ANY") -> None:
         '''
             The constructor of the DialogManager class.
                 :param fsm: dict
                     The dictionary representing the Final State Machine for the
                     dialog management.
+                :param accept_date: list, default = ["get_exercise", "get_meals", "kcals_burned", "kcals_gained"]
+                    The list of intent classes that accept DATE entities to form a action.
+                :param accept_cardinal: list, default = ["update_parameters"]
+                    The list of intent classes that accept CARDINAL entities to form a action.
+                :param accept_nouns: list, default = ["update_parameters", "how_to_make_exercises"]
+                    THe list of intent classes that accept NOUNS entities to form a action.
+                :param accepted_actions: list, default = None
+                    The intent classes used as actions, the intents of the default dialog if None.
+                :param fallback_action: str, default = "oos"
+                    The action used when no transition matches.
+                :param initial_state: str, default = "ANY"
+                    The initial state, whose transitions are available from every state.
         '''
         # Setting up the fields of the class.
         self.fsm = fsm
         # Defining the accepted intents as actions.
-        self.accepted_actions = ["thank_you", "good", "goodbye", "greeting", "get_exercise",
-                                 "get_meals", "get_goal_progress", "happy", "get_exercise_done",
-                                 "update_parameters", "how_to_make_exercises", "get_stats",
-                                 "kcals_burned", "kcals_gained", "angry", "tired"]
+        if accepted_actions is None:
+            accepted_actions = ["thank_you", "good", "goodbye", "greeting", "get_exercise",
+                                "get_meals", "get_goal_progress", "happy", "get_exercise_done",
+                                "update_parameters", "how_to_make_exercises", "get_stats",
+                                "kcals_burned", "kcals_gained", "angry", "tired"]
+        self.accepted_actions = accepted_actions
+
+        # Creation of the normalizer of the DATE entities.
+        self.date_normalizer = DateNormalizer()
+
+        # Compiling the FSM into indexed transition tables.
+        self.engine = CompiledFSM(fsm, self.accepted_actions, accept_date, accept_cardinal, accept_nouns,
+                                  fallback_action, initial_state)
 
-    def get_action_from_intent_and_ners(self,
-                                        state : str,
-                                        intent : str,
-                                        ners : dict,
-                                        accept_date : list = ["get_exercise", "get_meals", "kcals_burned", "kcals_gained"],
-                                        accept_cardinal : list = ["update_parameters"],
-                                        accept_nouns : list = ["update_parameters", "how_to_make_exercises"]):
+    def get_action_from_intent_and_ners(self, state : str, intent : str, ners : dict) -> str:
         '''
             This function converts the intent and the Named Entities into a action for FSM.
                 :param state: str
@@ -35,40 +56,10 @@ class DialogManager:
                     The name of the intent of the message.
                 :param ners: dict
                     All extracted Named Entities from the message.
-                :param accept_date: list, default = ["get_exercise", "get_meals", "kcals_burned", "kcals_gained"]
-                    The list of intent classes that accept DATE entities to form a action.
-                :param accept_cardinal: list, default = ["update_parameters"]
-                    The list of intent classes that accept CARDINAL entities to form a action.
-                :param accept_nouns: list, default = ["update_parameters", "how_to_make_exercises"]
-                    THe list of intent classes that accept NOUNS entities to form a action.
                 :return: str
                     The name of the action.
         '''
-        ners_to_add = []
-
-        # Checking if the intent class accepts any entities and adds the to the list of ners.
-        if intent in self.accepted_actions:
-            if intent in accept_cardinal and "CARDINAL" in ners:
-                ners_to_add.append("CARDINAL")
-            if intent in accept_date and "DATE" in ners:
-                ners_to_add.append("DATE")
-            if intent in accept_nouns and "NOUNS" in ners:
-                ners_to_add.append("NOUNS")
-        else:
-            # If the intent class doesn't require ners then find the action suitable for the last test.
-            for state_action_pair in self.fsm:
-                if state in state_action_pair:
-                    action = state_action_pair[1]
-                    params = re.findall("[A-Z]+", action)
-                    if params:
-                        ners_to_add = params.copy()
-                        intent = ""
-        # Joining the ners needed to create the action.
-        addition = "&".join(ners_to_add)
-
-        # Formulation of the action.
-        action = f"{intent}[{addition}]" if addition else f"{intent}"
-        return action
+        return self.engine.get_action(state, intent, ners)
 
     def preprocess_date(self, date_string : str) -> str:
         '''
@@ -78,12 +69,7 @@ class DialogManager:
                 :return: str
                     The string representing the date in the %d-%m-%Y format.
         '''
-        if date_string.lower() == "today":
-            return datetime.now().strftime("%d-%m-%Y")
-        elif date_string.lower() == "tomorrow":
-            return (datetime.now() + timedelta(days=1)).strftime("%d-%m-%Y")
-        else:
-            return parser.parse(date_string).strftime("%d-%m-%Y")
+        return self.date_normalizer.normalize(date_string)
 
     def post_process_ners(self, ners : dict, interest_ners : list = ["DATE", "CARDINAL", "NOUNS"]):
         '''
@@ -98,15 +84,14 @@ class DialogManager:
 
         # Processing each named entity depending on it's type.
         if "DATE" in ners:
-            for i in range(len(ners["DATE"])):
-                ners["DATE"][i] = self.preprocess_date(ners["DATE"][i])
+            ners = self.date_normalizer.normalize_ners(ners)
         if "CARDINAL" in ners:
             # Converting the cardinals into int or float.
-            for i in range(len(ners["CARDINAL"])):
-                if "." in ners["CARDINAL"][i]:
-                    ners["CARDINAL"][i] = float(ners["CARDINAL"][i])
-                else:
-                    ners["CARDINAL"][i] = int(ners["CARDINAL"][i])
+            # A new list is built as the predictions can be shared with the prediction cache.
+            ners["CARDINAL"] = [
+                float(cardinal) if "." in cardinal else int(cardinal)
+                for cardinal in ners["CARDINAL"]
+            ]
         if "NOUNS" in ners:
             # Filtering only the needed nouns.
             new_nouns = []
@@ -131,17 +116,32 @@ class DialogManager:
                     The predicted sentiment score of the message.
                     NOTE: At this version it is not used.
         '''
-        # Getting the action based on the intent and named entities.
-        action = self.get_action_from_intent_and_ners(state, intent, ners)
+        # Getting the new state of the dialog from the action based on the intent and named entities.
+        new_state, action = self.engine.step(state, intent, ners)
 
         # Post process the named entities.
         ners = self.post_process_ners(ners)
         print(f"ACTION - {action}")
 
-        # Getting the new state of the dialog.
-        if (state, action) in self.fsm:
-            new_state = self.fsm[(state, action)]
-        else:
-            new_state = self.fsm[("ANY", action)]
         # Returning the new state and the named entities.
-        return new_state, ners
\ No newline at end of file
+        return new_state, ners
+
+    def get_new_states(self, transitions : list, post_process : bool = True) -> list:
+        '''
+            This function returns the new states of many messages at once, for high-volume callers
+            like the replay of the conversations history.
+                :param transitions: list
+                    The list of (state, intent, ners) tuples.
+                :param post_process: bool, default = True
+                    If False the named entities are returned as they are, ex: when they were
+                    already post-processed before being stored.
+                :return: list
+                    The list of (new state, ners) tuples.
+        '''
+        new_states = self.engine.step_many(transitions)
+        if not post_process:
+            return [(new_state, ners) for (new_state, _), (_, _, ners) in zip(new_states, transitions)]
+        return [
+            (new_state, self.post_process_ners(ners))
+            for (new_state, _), (_, _, ners) in zip(new_states, transitions)
+        ]
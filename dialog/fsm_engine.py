@@ -0,0 +1,198 @@
+# Importing all needed modules.
+import re
+
+
+class CompiledFSM:
+    # The entity slots an action can require, in the order they appear in the action names.
+    SLOTS = ("CARDINAL", "DATE", "NOUNS")
+
+    def __init__(self,
+                 fsm : dict,
+                 accepted_actions : list,
+                 accept_date : list,
+                 accept_cardinal : list,
+                 accept_nouns : list,
+                 fallback_action : str = "oos",
+                 initial_state : str = "ANY") -> None:
+        '''
+            The constructor of the Compiled FSM.
+            The FSM is compiled once into integer indexed transition tables.
+                :param fsm: dict
+                    The dictionary mapping the (state, action) pairs to the new states.
+                :param accepted_actions: list
+                    The intent classes used as actions.
+                :param accept_date: list
+                    The intent classes that accept DATE entities to form a action.
+                :param accept_cardinal: list
+                    The intent classes that accept CARDINAL entities to form a action.
+                :param accept_nouns: list
+                    The intent classes that accept NOUNS entities to form a action.
+                :param fallback_action: str, default = "oos"
+                    The action of the initial state used when no transition matches.
+                :param initial_state: str, default = "ANY"
+                    The initial state, whose transitions are available from every state.
+        '''
+        # Numbering the states, the initial state being the state 0.
+        self.initial_state = initial_state
+        self.state_names = [initial_state]
+        self.state_ids = {initial_state : 0}
+        for state, _ in fsm:
+            self.add_state(state)
+        for new_state in fsm.values():
+            self.add_state(new_state)
+
+        # Numbering the actions.
+        self.action_names = []
+        self.action_ids = {}
+        for _, action in fsm:
+            self.add_action(action)
+
+        # Computing the entity slots expected by every accepted intent.
+        slot_acceptance = {"CARDINAL" : accept_cardinal, "DATE" : accept_date, "NOUNS" : accept_nouns}
+        self.intent_slots = {
+            intent : tuple(slot for slot in self.SLOTS if intent in slot_acceptance[slot])
+            for intent in accepted_actions
+        }
+
+        # Precomputing the action of every accepted intent for every subset of present slots.
+        # The subsets are indexed by a bit mask over the slots expected by the intent.
+        self.intent_actions = {}
+        for intent, slots in self.intent_slots.items():
+            actions = []
+            for mask in range(2 ** len(slots)):
+                present = [slot for i, slot in enumerate(slots) if mask & (1 << i)]
+                actions.append(self.add_action(f"{intent}[{'&'.join(present)}]" if present else intent))
+            self.intent_actions[intent] = actions
+
+        # Precomputing the action used by every state for the intents that aren't accepted as actions:
+        # the slots of the last transition of the state that requires any slots.
+        self.state_default_actions = [None] * len(self.state_names)
+        for state_id, state in enumerate(self.state_names):
+            for state_action_pair in fsm:
+                if state in state_action_pair:
+                    params = re.findall("[A-Z]+", state_action_pair[1])
+                    if params:
+                        self.state_default_actions[state_id] = self.add_action(f"[{'&'.join(params)}]")
+
+        # Building the transition table of every state, the transitions of the initial state being
+        # the fallback of the transitions of the state.
+        any_transitions = {
+            self.action_ids[action] : self.state_ids[new_state]
+            for (state, action), new_state in fsm.items() if state == initial_state
+        }
+        self.transitions = [dict(any_transitions) for _ in self.state_names]
+        for (state, action), new_state in fsm.items():
+            if state != initial_state:
+                self.transitions[self.state_ids[state]][self.action_ids[action]] = self.state_ids[new_state]
+        self.any_transitions = any_transitions
+
+        # Setting up the last resort transition.
+        fallback_action_id = self.action_ids.get(fallback_action)
+        self.fallback_state = any_transitions.get(fallback_action_id) if fallback_action_id is not None else None
+
+    def add_state(self, state : str) -> int:
+        '''
+            This function numbers a state if it isn't numbered yet.
+                :param state: str
+                    The name of the state.
+                :return: int
+                    The id of the state.
+        '''
+        if state not in self.state_ids:
+            self.state_ids[state] = len(self.state_names)
+            self.state_names.append(state)
+        return self.state_ids[state]
+
+    def add_action(self, action : str) -> int:
+        '''
+            This function numbers an action if it isn't numbered yet.
+                :param action: str
+                    The name of the action.
+                :return: int
+                    The id of the action.
+        '''
+        if action not in self.action_ids:
+            self.action_ids[action] = len(self.action_names)
+            self.action_names.append(action)
+        return self.action_ids[action]
+
+    def get_action_id(self, state_id : int, intent : str, ners : dict) -> int:
+        '''
+            This function converts the intent and the Named Entities into the id of an action.
+                :param state_id: int
+                    The id of the state of the FSM, None for a state unknown by the FSM.
+                :param intent: str
+                    The name of the intent of the message.
+                :param ners: dict
+                    All extracted Named Entities from the message.
+                :return: int
+                    The id of the action or None if the action isn't known by the FSM.
+        '''
+        actions = self.intent_actions.get(intent)
+        if actions is not None:
+            # Computing the mask of the expected slots present in the entities.
+            mask = 0
+            for i, slot in enumerate(self.intent_slots[intent]):
+                if slot in ners:
+                    mask |= 1 << i
+            return actions[mask]
+
+        # If the intent class doesn't form an action then the action of the state is used.
+        default_action = self.state_default_actions[state_id] if state_id is not None else None
+        return default_action if default_action is not None else self.action_ids.get(intent)
+
+    def get_action(self, state : str, intent : str, ners : dict) -> str:
+        '''
+            This function converts the intent and the Named Entities into a action for FSM.
+                :param state: str
+                    The string representing the state of the FSM.
+                :param intent: str
+                    The name of the intent of the message.
+                :param ners: dict
+                    All extracted Named Entities from the message.
+                :return: str
+                    The name of the action.
+        '''
+        action_id = self.get_action_id(self.state_ids.get(state), intent, ners)
+        return self.action_names[action_id] if action_id is not None else intent
+
+    def step(self, state : str, intent : str, ners : dict) -> tuple:
+        '''
+            This function makes a transition of the FSM.
+            The transition of the state is looked up first, then the one of the bare intent
+            and finally the fallback action of the initial state.
+                :param state: str
+                    The current state of the FSM.
+                :param intent: str
+                    The name of the intent of the message.
+                :param ners: dict
+                    All extracted Named Entities from the message.
+                :return: tuple
+                    The new state and the name of the action.
+        '''
+        # States unknown by the FSM use the transitions of the initial state.
+        state_id = self.state_ids.get(state)
+        action_id = self.get_action_id(state_id, intent, ners)
+        transitions = self.transitions[state_id] if state_id is not None else self.any_transitions
+
+        new_state_id = transitions.get(action_id)
+        if new_state_id is None:
+            new_state_id = self.any_transitions.get(self.action_ids.get(intent))
+        if new_state_id is None:
+            new_state_id = self.fallback_state
+        if new_state_id is None:
+            raise KeyError(f"No transition from {state} for the intent {intent}!")
+
+        action = self.action_names[action_id] if action_id is not None else intent
+        return self.state_names[new_state_id], action
+
+    def step_many(self, transitions : list) -> list:
+        '''
+            This function makes many transitions of the FSM at once.
+                :param transitions: list
+                    The list of (state, intent, ners) tuples.
+                :return: list
+                    The list of (new state, action) tuples.
+        '''
+        step = self.step
+        return [step(state, intent, ners) for state, intent, ners in transitions]
@@ -0,0 +1,105 @@
+# Importing all needed modules.
+from bisect import bisect_right
+import threading
+import hashlib
+
+
+def hash_key(key : str) -> int:
+    '''
+        This function maps a key to a position on the ring.
+            :param key: str
+                The key to hash.
+            :return: int
+                The position of the key, a 64 bits integer.
+    '''
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    def __init__(self, nodes : list = None, virtual_nodes : int = 128) -> None:
+        '''
+            The constructor of the consistent Hash Ring.
+                :param nodes: list, default = None
+                    The names of the nodes placed on the ring.
+                :param virtual_nodes: int, default = 128
+                    The number of positions of every node on the ring.
+                    More positions spread the keys more evenly between the nodes.
+        '''
+        self.virtual_nodes = virtual_nodes
+        self.nodes = set()
+        self.lock = threading.Lock()
+
+        # The sorted positions, the nodes owning them and the nodes count, replaced together when the ring changes.
+        self.ring = ((), (), 0)
+
+        for node in nodes or []:
+            self.add_node(node)
+
+    def rebuild(self) -> None:
+        '''
+            This function recomputes the positions of the nodes on the ring.
+        '''
+        points = sorted(
+            (hash_key(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(self.virtual_nodes)
+        )
+        self.ring = (tuple(point[0] for point in points), tuple(point[1] for point in points), len(self.nodes))
+
+    def add_node(self, node : str) -> None:
+        '''
+            This function places a node on the ring, only the keys it takes over changing owner.
+                :param node: str
+                    The name of the node.
+        '''
+        with self.lock:
+            self.nodes.add(node)
+            self.rebuild()
+
+    def remove_node(self, node : str) -> None:
+        '''
+            This function removes a node from the ring, its keys moving to the following nodes.
+                :param node: str
+                    The name of the node.
+        '''
+        with self.lock:
+            self.nodes.discard(node)
+            self.rebuild()
+
+    def node_for(self, key : str) -> str:
+        '''
+            This function returns the node owning a key.
+                :param key: str
+                    The key to look up.
+                :return: str
+                    The name of the owner or None if the ring is empty.
+        '''
+        positions, owners, _ = self.ring
+        if not positions:
+            return None
+        return owners[bisect_right(positions, hash_key(key)) % len(positions)]
+
+    def nodes_for(self, key : str, count : int = None) -> list:
+        '''
+            This function returns the distinct nodes following a key on the ring, the owner first.
+                :param key: str
+                    The key to look up.
+                :param count: int, default = None
+                    The maximal number of nodes returned, all the nodes if None.
+                :return: list
+                    The names of the nodes, in the order they should be tried.
+        '''
+        positions, owners, nodes_count = self.ring
+        count = nodes_count if count is None else min(count, nodes_count)
+        if count <= 0:
+            return []
+        start = bisect_right(positions, hash_key(key))
+
+        nodes = []
+        for index in range(len(positions)):
+            node = owners[(start + index) % len(positions)]
+            if node not in nodes:
+                nodes.append(node)
+                if len(nodes) == count:
+                    break
+        return nodes
@@ -0,0 +1,111 @@
+# Importing all needed modules.
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+import requests
+import threading
+
+
+class HttpClient:
+    def __init__(self,
+                 pool_connections : int = 16,
+                 pool_maxsize : int = 32,
+                 connect_timeout : float = 2.0,
+                 read_timeout : float = 10.0) -> None:
+        '''
+            The constructor of the shared HTTP Client.
+                :param pool_connections: int, default = 16
+                    The number of hosts for which a keep-alive connection pool is kept.
+                :param pool_maxsize: int, default = 32
+                    The maximal number of kept-alive connections per host.
+                :param connect_timeout: float, default = 2.0
+                    The number of seconds to wait for a connection to be established.
+                :param read_timeout: float, default = 10.0
+                    The number of seconds to wait for the response of a service.
+        '''
+        # Setting up the default timeouts of the requests.
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Creation of the session keeping a connection pool per host.
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        # Setting up the counters of requests and failures per host.
+        self.requests_count = {}
+        self.errors_count = {}
+        self.counters_lock = threading.Lock()
+
+    def count(self, counters : dict, url : str) -> None:
+        '''
+            This function increments the counter of the host of the url.
+                :param counters: dict
+                    The counters to update.
+                :param url: str
+                    The requested url.
+        '''
+        host = urlsplit(url).netloc
+        with self.counters_lock:
+            counters[host] = counters.get(host, 0) + 1
+
+    def request(self, method : str, url : str, timeout = None, **kwargs) -> requests.Response:
+        '''
+            This function sends a request reusing the kept-alive connections of the host.
+                :param method: str
+                    The HTTP method of the request.
+                :param url: str
+                    The requested url.
+                :param timeout: float or tuple, default = None
+                    The timeout of the request, the client timeouts being used if None.
+                :param kwargs: dict
+                    The arguments passed to requests (json, headers, data).
+                :return: requests.Response
+                    The response of the service.
+        '''
+        self.count(self.requests_count, url)
+        try:
+            return self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+        except requests.RequestException:
+            self.count(self.errors_count, url)
+            raise
+
+    def get(self, url : str, **kwargs) -> requests.Response:
+        '''
+            This function sends a GET request.
+                :param url: str
+                    The requested url.
+        '''
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url : str, **kwargs) -> requests.Response:
+        '''
+            This function sends a POST request.
+                :param url: str
+                    The requested url.
+        '''
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        '''
+            This function returns the statistics of the connection pools.
+                :return: dict
+                    For every host the number of requests, errors, opened connections and idle connections.
+        '''
+        stats = {}
+        pools = self.adapter.poolmanager.pools
+        for pool_key in list(pools.keys()):
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            host = f"{pool.host}:{pool.port}"
+            stats[host] = {
+                "connections_opened" : pool.num_connections,
+                "pool_requests" : pool.num_requests,
+                "idle_connections" : sum(1 for connection in list(pool.pool.queue) if connection is not None) if pool.pool is not None else 0
+            }
+        with self.counters_lock:
+            for host in self.requests_count:
+                stats.setdefault(host, {})
+                stats[host]["requests"] = self.requests_count[host]
+                stats[host]["errors"] = self.errors_count.get(host, 0)
+        return stats
@@ -0,0 +1,318 @@
+# Importing all needed modules.
+from concurrent.futures import ThreadPoolExecutor
+import configparser
+import subprocess
+import argparse
+import tempfile
+import requests
+import socket
+import random
+import json
+import re
+import logging
+import time
+import sys
+import os
+
+from stub_cluster import StubCluster
+from cerber import SecurityManager
+
+
+def percentiles(latencies : list) -> dict:
+    '''
+        This function computes the latency percentiles in milliseconds.
+            :param latencies: list
+                The latencies in seconds.
+            :return: dict
+                The count, p50, p95 and p99 of the latencies.
+    '''
+    if not latencies:
+        return {"count" : 0}
+    latencies = sorted(latencies)
+    def percentile(q):
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+    return {"count" : len(latencies), "p50" : percentile(0.50), "p95" : percentile(0.95), "p99" : percentile(0.99)}
+
+def scrape_histogram(base_url : str, name : str, label : str) -> dict:
+    '''
+        This function scrapes the buckets of a histogram from the /metrics endpoint of the dialog manager.
+            :param base_url: str
+                The url of the dialog manager.
+            :param name: str
+                The name of the histogram.
+            :param label: str
+                The label splitting the series of the histogram.
+            :return: dict
+                The mapping of the label values to their {upper bound : cumulative count} buckets.
+    '''
+    histograms = {}
+    bucket_pattern = re.compile(re.escape(name) + r"_bucket\{(.*)\} (\S+)")
+    for line in requests.get(f"{base_url}/metrics", timeout=5).text.splitlines():
+        match = bucket_pattern.fullmatch(line)
+        if match is None:
+            continue
+        labels = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(1)))
+        histograms.setdefault(labels.get(label), {})[float(labels["le"])] = float(match.group(2))
+    return histograms
+
+def histogram_percentiles(buckets : dict, previous_buckets : dict = None) -> dict:
+    '''
+        This function estimates the percentiles in milliseconds from the buckets of a histogram,
+        interpolating linearly inside the bucket holding the percentile.
+            :param buckets: dict
+                The {upper bound : cumulative count} buckets of the histogram.
+            :param previous_buckets: dict, default = None
+                The buckets scraped before the load, subtracted from the buckets.
+            :return: dict
+                The count, p50, p95 and p99 of the observations.
+    '''
+    previous_buckets = previous_buckets or {}
+    bounds = sorted(buckets)
+    counts = [buckets[bound] - previous_buckets.get(bound, 0) for bound in bounds]
+    if not counts or counts[-1] <= 0:
+        return {"count" : 0}
+    def percentile(q):
+        rank = q * counts[-1]
+        lower_bound, lower_count = 0.0, 0.0
+        for bound, count in zip(bounds, counts):
+            if count >= rank:
+                if bound == float("inf"):
+                    # The percentile is above the last finite bound.
+                    return round(lower_bound * 1000, 2)
+                fraction = (rank - lower_count) / (count - lower_count) if count > lower_count else 1.0
+                return round((lower_bound + (bound - lower_bound) * fraction) * 1000, 2)
+            lower_bound, lower_count = bound, count
+    return {"count" : int(counts[-1]), "p50" : percentile(0.50), "p95" : percentile(0.95), "p99" : percentile(0.99)}
+
+def load_corpus(filename : str) -> list:
+    '''
+        This function loads the texts of the messages from a JSONL corpus.
+        The "text" field of every line is used, or its "title" if it has no text.
+            :param filename: str
+                The path to the corpus.
+            :return: list
+                The texts of the messages.
+    '''
+    texts = []
+    with open(filename, "r") as corpus_file:
+        for line in corpus_file:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record.get("text") or record.get("title"))
+    return [text for text in texts if text]
+
+def free_port() -> int:
+    '''
+        This function returns a free local port.
+    '''
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def write_config(template : str, filename : str, port : int, service_discovery_port : int, database_uri : str) -> None:
+    '''
+        This function writes the configuration of the dialog manager under test.
+            :param template: str
+                The path to the configuration file used as template.
+            :param filename: str
+                The path of the configuration to write.
+            :param port: int
+                The port of the dialog manager.
+            :param service_discovery_port: int
+                The port of the stub Service Discovery.
+            :param database_uri: str
+                The uri of the Data Base of the dialog manager.
+    '''
+    parser = configparser.ConfigParser()
+    parser.read(template)
+    parser["general"]["host"] = "127.0.0.1"
+    parser["general"]["port"] = str(port)
+    parser["service-discovery"]["host"] = "127.0.0.1"
+    parser["service-discovery"]["port"] = str(service_discovery_port)
+    parser["database"]["uri"] = database_uri
+    parser["data-warehouse-shipper"]["spool_path"] = os.path.join(os.path.dirname(filename), "spool.jsonl")
+    with open(filename, "w") as config_file:
+        parser.write(config_file)
+
+class LoadGenerator:
+    def __init__(self, base_url : str, secret_key : str, concurrency : int = 64) -> None:
+        '''
+            The constructor of the Load Generator.
+                :param base_url: str
+                    The url of the dialog manager.
+                :param secret_key: str
+                    The secret key of the dialog manager.
+                :param concurrency: int, default = 64
+                    The maximal number of requests in flight.
+        '''
+        self.base_url = base_url
+        self.security_manager = SecurityManager(secret_key)
+        self.session = requests.Session()
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.latencies = {}
+        self.errors = {}
+
+    def call(self, endpoint : str, body : dict, scheduled_at : float) -> None:
+        '''
+            This function sends a signed request and records its latency from the time it was scheduled.
+                :param endpoint: str
+                    The endpoint of the dialog manager.
+                :param body: dict
+                    The request body.
+                :param scheduled_at: float
+                    The time the request was scheduled, so the queueing delay is measured too.
+        '''
+        data, headers = self.security_manager.sign_request(body)
+        try:
+            response = self.session.post(f"{self.base_url}/{endpoint}", data=data, headers=headers, timeout=30)
+            is_error = response.status_code >= 500
+        except requests.RequestException:
+            is_error = True
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - scheduled_at)
+        if is_error:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def run(self, requests_list : list, rps : float) -> float:
+        '''
+            This function sends the requests at a target rate, without waiting for the previous ones.
+                :param requests_list: list
+                    The list of (endpoint, body) requests.
+                :param rps: float
+                    The target number of requests per second.
+                :return: float
+                    The achieved number of requests per second.
+        '''
+        start = time.perf_counter()
+        futures = []
+        for i, (endpoint, body) in enumerate(requests_list):
+            scheduled_at = start + i / rps
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(self.executor.submit(self.call, endpoint, body, scheduled_at))
+        for future in futures:
+            future.result()
+        return len(requests_list) / (time.perf_counter() - start)
+
+def user_body(telegram_user_id : int, text : str) -> dict:
+    '''
+        This function creates the body of a request from a telegram user.
+    '''
+    return {
+        "text" : text,
+        "telegram_user_id" : telegram_user_id,
+        "first_name" : "Load",
+        "last_name" : "Test",
+        "username" : f"load_test_{telegram_user_id}",
+        "chat_id" : telegram_user_id
+    }
+
+def main() -> None:
+    # Parsing the command line arguments.
+    argument_parser = argparse.ArgumentParser(description="Load tests the dialog manager against a local stub cluster.")
+    argument_parser.add_argument("--config", default="config.ini", help="The configuration file used as template.")
+    argument_parser.add_argument("--corpus", default=None, help="A JSONL corpus with a text (or title) field per line.")
+    argument_parser.add_argument("--rps", type=float, default=50, help="The target number of /message requests per second.")
+    argument_parser.add_argument("--duration", type=float, default=20, help="The number of seconds of load.")
+    argument_parser.add_argument("--users", type=int, default=10, help="The number of users registered through /user.")
+    argument_parser.add_argument("--concurrency", type=int, default=64, help="The maximal number of requests in flight.")
+    argument_parser.add_argument("--latency-ms", type=float, default=5.0, help="The median latency of the stub services.")
+    argument_parser.add_argument("--latency-sigma", type=float, default=0.5, help="The log-normal sigma of the stub latencies.")
+    argument_parser.add_argument("--failure-rate", type=float, default=0.0, help="The failure probability of the stub services.")
+    argument_parser.add_argument("--sidecar-latency-ms", type=float, default=None, help="The median latency of the sidecar stubs.")
+    argument_parser.add_argument("--sidecar-replicas", type=int, default=1, help="The number of replicas of every sidecar stub.")
+    argument_parser.add_argument("--cache-latency-ms", type=float, default=None, help="The median latency of the cache stubs.")
+    args = argument_parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+
+    # Silencing the request logs of the stubs.
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    # Starting the stub cluster.
+    overrides = {}
+    for names, latency_ms in [(StubCluster.SIDECARS, args.sidecar_latency_ms), (StubCluster.CACHES, args.cache_latency_ms)]:
+        if latency_ms is not None:
+            overrides.update({name : {"latency_ms" : latency_ms} for name in names})
+    cluster = StubCluster(
+        config["service-discovery"]["secret-key"], args.latency_ms, args.latency_sigma, args.failure_rate, overrides, args.sidecar_replicas
+    )
+    cluster.start()
+
+    # Starting the dialog manager against the stub cluster.
+    work_dir = tempfile.mkdtemp(prefix="dialog-manager-load-test-")
+    config_path = os.path.join(work_dir, "config.ini")
+    port = free_port()
+    write_config(args.config, config_path, port, cluster.service_discovery.port, f"sqlite:///{os.path.join(work_dir, 'load_test.db')}")
+    log_file = open(os.path.join(work_dir, "dialog_manager.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, "main.py"],
+        env = dict(os.environ, DIALOG_MANAGER_CONFIG=config_path),
+        cwd = os.path.dirname(os.path.abspath(__file__)),
+        stdout = log_file,
+        stderr = subprocess.STDOUT
+    )
+    try:
+        # Waiting for the dialog manager to register and start serving.
+        base_url = f"http://127.0.0.1:{port}"
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            try:
+                requests.get(f"{base_url}/stats", timeout=1)
+                break
+            except requests.RequestException:
+                if process.poll() is not None:
+                    raise RuntimeError("The dialog manager exited before serving.")
+                time.sleep(0.5)
+        else:
+            raise RuntimeError("The dialog manager didn't start serving.")
+
+        generator = LoadGenerator(base_url, config["security"]["secret_key"], args.concurrency)
+        texts = load_corpus(args.corpus) if args.corpus else [
+            "hi", "hello there", "thanks a lot", "bye", "show me my exercise for today", "what meals do I have tomorrow",
+            "what is my progress", "update my weight to 80", "show my stats", "I am tired", "good", "what is the weather"
+        ]
+
+        # Registering the users.
+        telegram_user_ids = [1000 + i for i in range(args.users)]
+        generator.run([("user", user_body(telegram_user_id, "code")) for telegram_user_id in telegram_user_ids], rps=args.rps)
+
+        # Sending the messages, the stage durations being measured by the dialog manager itself.
+        stages_before = scrape_histogram(base_url, "dialog_manager_stage_seconds", "stage")
+        messages = [
+            ("message", user_body(random.choice(telegram_user_ids), random.choice(texts)))
+            for _ in range(int(args.rps * args.duration))
+        ]
+        achieved_rps = generator.run(messages, rps=args.rps)
+        stages_after = scrape_histogram(base_url, "dialog_manager_stage_seconds", "stage")
+
+        # Reporting the latencies.
+        report = {
+            "target_rps" : args.rps,
+            "achieved_rps" : round(achieved_rps, 1),
+            "endpoints" : {
+                endpoint : dict(percentiles(generator.latencies[endpoint]), errors=generator.errors.get(endpoint, 0))
+                for endpoint in generator.latencies
+            },
+            "stages" : {
+                stage : histogram_percentiles(stages_after[stage], stages_before.get(stage))
+                for stage in sorted(stages_after)
+            },
+            "stub_services" : {
+                service : dict(percentiles(cluster.recorder.latencies[service]), errors=cluster.recorder.failures.get(service, 0))
+                for service in sorted(cluster.recorder.latencies)
+            },
+            "dialog_manager_stats" : requests.get(f"{base_url}/stats", timeout=5).json()
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        process.terminate()
+        process.wait()
+        log_file.close()
+        cluster.stop()
+        print(f"The dialog manager logs are in {log_file.name}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
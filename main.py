@@ -1,130 +1,165 @@
 # Importing the external libraries.
 from flask import Flask, request, jsonify
-from flask_script import Manager
+from flask.json.provider import JSONProvider
 from flask_migrate import Migrate
 import threading
 import requests
 import random
 import json
+import os
 import time
 import uuid
 
 # Importing all needed modules.
 from models import UserModel, MessageModel
 from cache_round_robin import CacheRoundRobin
-from transaction_saga import TransactionSaga
-from dialog import DialogManager, PhraseFormatter, RandomPhrase, FullStateRequests
+from prediction_cache import PredictionCache
+from cache_write_behind import CacheWriteBehind
+from data_warehouse_shipper import DataWarehouseShipper
+from telegram_dispatcher import TelegramDispatcher
+from conversation_store import ConversationStore, ConversationTurn
+from user_cache import UserIdentityCache, UserIdentity
+from http_client import HttpClient
+from transaction_saga import TransactionSaga, TIMED_OUT
+from dialog import DialogGraphRegistry, PhraseFormatter, RandomPhrase
+from codec import codec, JSON_BACKENDS
+from metrics import metrics
+from tracing import tracer, RingBufferExporter, FileExporter
 from cerber import SecurityManager
 from schemas import MessageSchema
 from config import ConfigManager
 from models import db
-from fsm import FSM
 
-# Loading the configuration from the configuration file.
-config = ConfigManager("config.ini")
+# Loading the configuration from the configuration file, which can be replaced through the environment.
+config = ConfigManager(os.environ.get("DIALOG_MANAGER_CONFIG", "config.ini"))
+
+# Switching the codec used for the requests, the responses and the JSON columns, an optional backend falling back to json.
+codec_backend = config.codec.backend
+if codec_backend not in JSON_BACKENDS:
+    print(f"The JSON backend {codec_backend} isn't installed, using json instead")
+    codec_backend = "json"
+codec.configure(
+    backend = codec_backend,
+    wire_backend = config.codec.wire_backend,
+    binary_transport = config.codec.binary_transport
+)
+
+# Switching the exporter and the sample rate of the traces.
+tracer.configure(
+    exporter = FileExporter(config.tracing.path) if config.tracing.exporter == "file"
+        else RingBufferExporter(config.tracing.ring_size),
+    sample_rate = config.tracing.sample_rate
+)
 
 # Creation of the message schema object.
 message_schema = MessageSchema()
 
 # Setting up the sqlalchemy database uri.
-sqlalchemy_database_uri = f"postgresql://{config.database.username}:{config.database.password}@{config.database.host}/{config.database.db_name}"
+sqlalchemy_database_uri = getattr(
+    config.database, "uri",
+    f"postgresql://{config.database.username}:{config.database.password}@{config.database.host}/{config.database.db_name}"
+)
+
+class CodecJSONProvider(JSONProvider):
+    '''
+        The Flask JSON provider parsing the requests and encoding the responses with the codec.
+    '''
+    def dumps(self, obj, **kwargs) -> str:
+        return codec.dumps_str(obj)
+
+    def loads(self, s, **kwargs):
+        return codec.loads(s)
 
 # Setting up the Flask dependencies.
 app = Flask(__name__)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config["SQLALCHEMY_DATABASE_URI"] = sqlalchemy_database_uri
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"json_serializer" : codec.dumps_str, "json_deserializer" : codec.loads}
+app.json = CodecJSONProvider(app)
 app.secret_key = config.security.secret_key
 
 migrate = Migrate(app, db)
 
+# Creation of the HTTP client shared by all outbound calls.
+http_client = HttpClient(
+    pool_connections = config.http_client.pool_connections,
+    pool_maxsize = config.http_client.pool_maxsize,
+    connect_timeout = config.http_client.connect_timeout,
+    read_timeout = config.http_client.read_timeout
+)
+
 # Creating the security manager for the service discovery.
 service_discovery_security_manager = SecurityManager(config.service_discovery.secret_key)
 
-# Computing the HMAC for Service Discovery registration.
-SERVICE_DISCOVERY_HMAC = service_discovery_security_manager._SecurityManager__encode_hmac(
+# Signing the Service Discovery registration body.
+SERVICE_DISCOVERY_BODY, SERVICE_DISCOVERY_HEADERS = service_discovery_security_manager.sign_request(
     config.generate_info_for_service_discovery()
 )
 
 # Creation of the Security Manager.
 security_manager = SecurityManager(config.security.secret_key)
 
-# Defining the empty services credentials holders.
-DATA_WAREHOUSE_DATA = {}
-services = {}
-CACHE_SERVICES = {}
-TELEGRAM_INTERFACE_DATA = {}
-
 def send_heartbeats():
     '''
         This function sends heartbeat requests to the service discovery.
     '''
-    # Getting the Service discovery hmac for message.
-    service_discovery_hmac = service_discovery_security_manager._SecurityManager__encode_hmac({"status_code" : 200})
+    # Signing the heartbeat body once, it never changes.
+    heartbeat_body, heartbeat_headers = service_discovery_security_manager.sign_request({"status_code" : 200})
     while True:
         # Senting the request.
-        response = requests.post(
-            f"http://{config.service_discovery.host}:{config.service_discovery.port}/heartbeat/{config.general.name}",
-            json = {"status_code" : 200},
-            headers = {"Token" : service_discovery_hmac}
-        )
+        try:
+            response = http_client.post(
+                f"http://{config.service_discovery.host}:{config.service_discovery.port}/heartbeat/{config.general.name}",
+                data = heartbeat_body,
+                headers = heartbeat_headers
+            )
+        except requests.RequestException:
+            # A missed heartbeat must not stop the next ones.
+            pass
         # Making a pause of 30 seconds before sending the next request.
         time.sleep(30)
 
-# Registering to the Service discovery.
-while True:
-    # Sending the request to the service discovery.
-    resp = requests.post(
-        f"http://{config.service_discovery.host}:{config.service_discovery.port}/{config.service_discovery.register_endpoint}",
-        json = config.generate_info_for_service_discovery(),
-        headers={"Token" : SERVICE_DISCOVERY_HMAC}
-    )
+# The names of the caches placed on the hash ring.
+CACHE_NAMES = [name.strip() for name in config.cache_ring.nodes.split(",") if name.strip()]
 
-    # If the request is successful then we are going to request the credentials of the needed services.
-    if resp.status_code == 200:
-        while True:
-            time.sleep(3)
-            # Computing the Service Discovery HMAC for getting services credentials.
-            service_discovery_hmac = SecurityManager(config.service_discovery.secret_key)._SecurityManager__encode_hmac(
-                {"service_names" : ["cache-service-1", "cache-service-2", "data-warehouse-service", "intent-sidecar-service",
-                                    "named-entity-recognition-sidecar-service", "sentiment-sidecar-service", "telegram_interface"]}
-            )
-            # Trying to get the credentials of the services from the Service Discovery.
-            res = requests.get(
-                f"http://{config.service_discovery.host}:{config.service_discovery.port}/get_services",
-                json = {"service_names" : ["cache-service-1", "cache-service-2", "data-warehouse-service", "intent-sidecar-service",
-                                           "named-entity-recognition-sidecar-service", "sentiment-sidecar-service", "telegram_interface"]},
-                headers={"Token" : service_discovery_hmac}
-            )
-            # Checking is the request was successful.
-            if res.status_code == 200:
-                time.sleep(5)
-                # Starting sending heartbeats.
-                threading.Thread(target=send_heartbeats).start()
-
-                # Splitting the requested data by services.
-                res_json = res.json()
-                CACHE_SERVICES = {service_info : res_json[service_info] for service_info in res_json
-                                  if service_info in ["cache-service-1", "cache-service-2"]}
-
-                DATA_WAREHOUSE_DATA = {
-                    "host" : res_json["data-warehouse-service"]["general"]["host"],
-                    "port" : res_json["data-warehouse-service"]["general"]["port"],
-                    "security_manager" : SecurityManager(res_json["data-warehouse-service"]["security"]["secret_key"])
-                }
-
-                services = {service_info : res_json[service_info] for service_info in res_json
-                            if service_info in ["intent-sidecar-service", "named-entity-recognition-sidecar-service", "sentiment-sidecar-service"]}
-
-                TELEGRAM_INTERFACE_DATA = {
-                    "host" : res_json["telegram_interface"]["general"]["host"],
-                    "port" : res_json["telegram_interface"]["general"]["port"],
-                    "security_manager" : SecurityManager(res_json["telegram_interface"]["security"]["secret_key"])
-                }
-
-                break
-        break
-    else:
-        time.sleep(10)
+def register_to_service_discovery() -> dict:
+    '''
+        This function registers the service to the Service Discovery, retrying until it is reachable,
+        and starts sending the heartbeats.
+            :return: dict
+                The credentials of the needed services, as returned by the Service Discovery.
+    '''
+    while True:
+        # Sending the request to the service discovery.
+        resp = http_client.post(
+            f"http://{config.service_discovery.host}:{config.service_discovery.port}/{config.service_discovery.register_endpoint}",
+            data = SERVICE_DISCOVERY_BODY,
+            headers = SERVICE_DISCOVERY_HEADERS
+        )
+
+        # If the request is successful then we are going to request the credentials of the needed services.
+        if resp.status_code == 200:
+            while True:
+                time.sleep(3)
+                # Signing the Service Discovery request for getting services credentials.
+                services_body, services_headers = service_discovery_security_manager.sign_request(
+                    {"service_names" : CACHE_NAMES + ["data-warehouse-service", "intent-sidecar-service",
+                                        "named-entity-recognition-sidecar-service", "sentiment-sidecar-service", "telegram_interface"]}
+                )
+                # Trying to get the credentials of the services from the Service Discovery.
+                res = http_client.get(
+                    f"http://{config.service_discovery.host}:{config.service_discovery.port}/get_services",
+                    data = services_body,
+                    headers = services_headers
+                )
+                # Checking is the request was successful.
+                if res.status_code == 200:
+                    time.sleep(5)
+                    # Starting sending heartbeats, the thread not keeping the process alive on exit.
+                    threading.Thread(target=send_heartbeats, name="heartbeats", daemon=True).start()
+                    return codec.decode_response(res)
+        else:
+            time.sleep(10)
 
 function_to_service_mapping = {
     "sentiment" : "sentiment-sidecar-service",
@@ -138,20 +173,172 @@ service_to_function_mapping = {
     "named-entity-recognition-sidecar-service" : "ner"
 }
 
-# Creation of the cache round robin.
-cache_manager = CacheRoundRobin(CACHE_SERVICES)
+# The predictions used when a sidecar failed or timed out.
+default_predictions = {
+    "intent" : "oos",
+    "ner" : {},
+    "sentiment" : 0.5
+}
 
-# Creation of the dialog Manager.
-dialog_manager = DialogManager(FSM)
+# Creation of the in-process prediction cache.
+prediction_cache = PredictionCache(
+    max_entries = config.prediction_cache.max_entries,
+    max_bytes = config.prediction_cache.max_bytes,
+    ttl = config.prediction_cache.ttl
+)
+
+# The components calling the other services, created by start_service once their credentials are known.
+transaction_saga = None
+data_warehouse_shipper = None
+telegram_dispatcher = None
+cache_manager = None
+cache_writer = None
+
+def start_service() -> None:
+    '''
+        This function registers the service and creates the components calling the other services, with their workers.
+        It is called when the service is started, so importing main (as the flask db commands do) has no side effect.
+    '''
+    global transaction_saga, data_warehouse_shipper, telegram_dispatcher, cache_manager, cache_writer
+
+    # Splitting the requested data by services.
+    res_json = register_to_service_discovery()
+    cache_services = {service_info : res_json[service_info] for service_info in res_json
+                      if service_info in CACHE_NAMES}
+
+    data_warehouse_data = {
+        "host" : res_json["data-warehouse-service"]["general"]["host"],
+        "port" : res_json["data-warehouse-service"]["general"]["port"],
+        "security_manager" : SecurityManager(res_json["data-warehouse-service"]["security"]["secret_key"])
+    }
+
+    services = {service_info : res_json[service_info] for service_info in res_json
+                if service_info in ["intent-sidecar-service", "named-entity-recognition-sidecar-service", "sentiment-sidecar-service"]}
+
+    telegram_interface_data = {
+        "host" : res_json["telegram_interface"]["general"]["host"],
+        "port" : res_json["telegram_interface"]["general"]["port"],
+        "security_manager" : SecurityManager(res_json["telegram_interface"]["security"]["secret_key"])
+    }
+
+    # Creation of the transaction saga requesting the sidecars.
+    transaction_saga = TransactionSaga(
+        services,
+        http_client,
+        max_workers = config.transaction_saga.max_workers,
+        deadline = config.transaction_saga.deadline,
+        service_timeouts = config.saga_timeouts_dict,
+        breaker_options = config.circuit_breaker_dict,
+        balancer_options = config.replica_balancer_dict,
+        hedging = bool(config.transaction_saga.hedging),
+        hedge_percentile = config.transaction_saga.hedge_percentile,
+        batching_options = {
+            "window" : config.micro_batching.window,
+            "max_batch_size" : config.micro_batching.max_batch_size,
+            "max_concurrent_batches" : config.micro_batching.max_concurrent_batches
+        } if config.micro_batching.enabled else None
+    )
+
+    # Creation of the shipper sending the facts to the Data Warehouse in the background.
+    data_warehouse_shipper = DataWarehouseShipper(
+        data_warehouse_data,
+        http_client,
+        batch_size = config.data_warehouse_shipper.batch_size,
+        flush_interval = config.data_warehouse_shipper.flush_interval,
+        max_retries = config.data_warehouse_shipper.max_retries,
+        backoff = config.data_warehouse_shipper.backoff,
+        max_queue = config.data_warehouse_shipper.max_queue,
+        spool_path = config.data_warehouse_shipper.spool_path
+    )
+
+    # Creation of the dispatcher sending the responses to the Telegram Interface.
+    telegram_dispatcher = TelegramDispatcher(
+        telegram_interface_data,
+        http_client,
+        workers = config.telegram_dispatcher.workers,
+        max_retries = config.telegram_dispatcher.max_retries,
+        backoff = config.telegram_dispatcher.backoff,
+        max_queue = config.telegram_dispatcher.max_queue
+    )
+
+    # Creation of the cache round robin.
+    cache_manager = CacheRoundRobin(
+        cache_services,
+        prediction_cache,
+        http_client,
+        virtual_nodes = config.cache_ring.virtual_nodes,
+        replicas = config.cache_ring.replicas,
+        parallel_reads = bool(config.cache_ring.parallel_reads)
+    )
+
+    # Creation of the writer pushing the fresh predictions into the caches.
+    cache_writer = CacheWriteBehind(
+        cache_manager,
+        batch_size = config.cache_write_behind.batch_size,
+        flush_interval = config.cache_write_behind.flush_interval,
+        max_queue = config.cache_write_behind.max_queue
+    )
 
 # Loading the predefined phrases and phrase formatter.
 phrase_formats = json.load(open("phrases_formats.json", "r"))
 predefined_phrases = json.load(open("predefined_phrases.json", "r"))
 
+# Loading the dialog graph, compiled into the dialog Manager.
+dialog_graphs = DialogGraphRegistry(config.dialog_graph.path, predefined_phrases)
+
+def load_user(telegram_user_id : int) -> UserIdentity:
+    '''
+        This function loads the identity of a telegram user from the Data Base.
+            :param telegram_user_id: int
+                The telegram id of the user.
+            :return: UserIdentity
+                The identity of the user or None if the user isn't registered.
+    '''
+    user = UserModel.query.filter_by(telegram_id = telegram_user_id).first()
+    return UserIdentity(user.id, user.app_id) if user else None
+
+# Creation of the cache of the registered users.
+user_cache = UserIdentityCache(
+    load_user,
+    ttl = config.user_cache.ttl,
+    negative_ttl = config.user_cache.negative_ttl,
+    max_entries = config.user_cache.max_entries
+)
+
+def load_conversation(user_id : str, max_turns : int) -> list:
+    '''
+        This function loads the last turns of the conversation of the user from the Data Base.
+            :param user_id: str
+                The id of the user.
+            :param max_turns: int
+                The maximal number of turns to load.
+            :return: list
+                The turns of the conversation, from the oldest to the newest.
+    '''
+    messages = MessageModel.query.filter_by(user_id = user_id).order_by(MessageModel.date.desc()).limit(max_turns).all()
+    return [
+        ConversationTurn(message.text, message.intent, message.state, message.date)
+        for message in reversed(messages)
+    ]
+
+# Creation of the store of the conversations states, held by this process only (see ConversationStore).
+conversation_store = ConversationStore(
+    load_conversation,
+    max_users = config.conversation_store.max_users,
+    max_turns = config.conversation_store.max_turns,
+    default_state = dialog_graphs.current.initial_state
+)
+
 # Creation of the response generators.
 phrase_formatter = PhraseFormatter(phrase_formats)
 predefined_phrases_generator = RandomPhrase(predefined_phrases)
-full_state_request_creator = FullStateRequests()
+
+# Declaring the metrics of the message pipeline.
+metrics.histogram("dialog_manager_stage_seconds", "The duration of the stages of the message pipeline.")
+metrics.counter("dialog_manager_cache_hits", "The number of predictions served by the caches.")
+metrics.counter("dialog_manager_cache_misses", "The number of predictions missing from the caches.")
+metrics.counter("dialog_manager_states_served", "The number of messages answered from a dialog state.")
+metrics.counter("dialog_manager_default_predictions", "The number of predictions replaced by their default after a failed or timed out sidecar.")
 
 # Creation of the tables in the database.
 with app.app_context():
@@ -159,8 +346,89 @@ with app.app_context():
     db.create_all()
     db.session.commit()
 
+@app.route("/stats", methods=["GET"])
+def stats():
+    # Returning the statistics of the connection pools and of the in-process cache.
+    return {
+        "http_client" : http_client.stats(),
+        "prediction_cache" : prediction_cache.stats(),
+        "cache_write_behind" : cache_writer.stats(),
+        "data_warehouse_shipper" : data_warehouse_shipper.stats(),
+        "telegram_dispatcher" : telegram_dispatcher.stats(),
+        "conversation_store" : conversation_store.stats(),
+        "user_cache" : user_cache.stats(),
+        "transaction_saga" : transaction_saga.stats(),
+        "tracer" : tracer.stats()
+    }, 200
+
+@app.route("/metrics", methods=["GET"])
+def export_metrics():
+    # Returning the pipeline metrics in the Prometheus text format.
+    return metrics.export(), 200, {"Content-Type" : "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route("/traces", methods=["GET"])
+def latest_traces():
+    # Returning the last traces kept in memory.
+    if not isinstance(tracer.exporter, RingBufferExporter):
+        return {
+            "message" : "The traces are exported to a file!",
+            "code" : 404
+        }, 404
+    return {
+        "traces" : tracer.exporter.latest(request.args.get("limit", 100, type=int))
+    }, 200
+
+@app.route("/traces/<correlation_id>", methods=["GET"])
+def get_trace(correlation_id : str):
+    # Returning the trace of a message if it was sampled and is still kept in memory.
+    trace = tracer.exporter.find(correlation_id) if isinstance(tracer.exporter, RingBufferExporter) else None
+    if trace is None:
+        return {
+            "message" : "Trace not found!",
+            "code" : 404
+        }, 404
+    return trace, 200
+
+@app.route("/dialog_graph/reload", methods=["POST"])
+def reload_dialog_graph():
+    # Checking the access token.
+    check_response = security_manager.check_request(request)
+    if check_response != "OK":
+        return check_response, check_response["code"]
+    else:
+        try:
+            # Swapping the new dialog graph in, the messages being processed keeping the previous one.
+            dialog_graph = dialog_graphs.reload()
+            # The conversations without any message start from the initial state of the new graph.
+            conversation_store.default_state = dialog_graph.initial_state
+        except (ValueError, OSError) as err:
+            # The previous dialog graph stays in use.
+            return {
+                "message" : str(err),
+                "code" : 400
+            }, 400
+        return {
+            "version" : dialog_graph.version,
+            "states" : len(dialog_graph.states)
+        }, 200
+
 @app.route("/message", methods=["POST"])
 def message():
+    # Tracing the message if it is sampled.
+    correlation_id = str(uuid.uuid4())
+    with tracer.trace(correlation_id) as trace:
+        return process_message(correlation_id, trace)
+
+def process_message(correlation_id : str, trace) -> tuple:
+    '''
+        This function runs the message pipeline.
+            :param correlation_id: str
+                The correlation id of the message.
+            :param trace: Trace
+                The trace of the message, NOOP_TRACE if the message isn't sampled.
+            :return: tuple
+                The response body and its status code.
+    '''
     # Checking the access token.
     check_response = security_manager.check_request(request)
     if check_response != "OK":
@@ -168,7 +436,8 @@ def message():
     else:
         status_code = 200
 
-        result, status_code = message_schema.validate_json(request.json)
+        with metrics.timer("dialog_manager_stage_seconds", stage="schema_validation"), tracer.span("schema_validation"):
+            result, status_code = message_schema.validate_json(request.json)
         if status_code != 200:
             # If the request body didn't passed the json validation a error is returned.
             return result, status_code
@@ -176,39 +445,28 @@ def message():
             # Check if user is a registered one.
             telegram_user_id = result["telegram_user_id"]
             chat_id = result["chat_id"]
+            trace.tag(telegram_user_id=telegram_user_id)
 
-            # Getting the user record from the Data Base.
-            user = UserModel.query.filter_by(telegram_id = telegram_user_id).first()
+            # Getting the user identity from the cache or the Data Base.
+            with metrics.timer("dialog_manager_stage_seconds", stage="user_lookup"), tracer.span("user_lookup"):
+                user = user_cache.get(telegram_user_id)
 
             # Announcing that the user is not registered.
             if not user:
-                requests.post(
-                    f"http://{TELEGRAM_HOST}:{TELEGRAM_PORT}/send_response",
-                    json = {"text" : "Sorry you are not a registered user!",
-                            "chat_id" : chat_id},
-                    headers = {"Token" : None}
-                )
+                telegram_dispatcher.send(chat_id, "Sorry you are not a registered user!")
                 return {
                     "message" : "Not registered user!"
                 }, 403
             else:
                 # Getting the user id.
-                user_id = user.id
+                user_id = user.user_id
 
             text = result["text"]
             date = time.time()
-            correlation_id = str(uuid.uuid4())
 
-            # Check message in cache.
-            ner = cache_manager.get_value(text, "ner")
-            sentiment = cache_manager.get_value(text, "sentiment")
-            intent = cache_manager.get_value(text, "intent")
-
-            grouped_results = {
-                "ner" : ner,
-                "sentiment" : sentiment,
-                "intent" : intent
-            }
+            # Check message in cache, all the predictions being requested in one round-trip.
+            with metrics.timer("dialog_manager_stage_seconds", stage="cache_lookup"), tracer.span("cache_lookup"):
+                grouped_results = cache_manager.get_values(text, ["ner", "sentiment", "intent"])
 
             services_for_transaction_saga = []
             cached_values = {}
@@ -219,30 +477,50 @@ def message():
                 if grouped_results[result] is not None:
                     cached_values[result] = grouped_results[result]
                     is_cached_dict[result] = True
+                    metrics.increment("dialog_manager_cache_hits", service=result)
                 else:
                     services_for_transaction_saga.append(function_to_service_mapping[result])
                     is_cached_dict[result] = False
+                    metrics.increment("dialog_manager_cache_misses", service=result)
+
+            # Running the transaction saga, the sidecars being requested concurrently.
+            # If every prediction was cached no sidecar is called.
+            transaction_saga_results = {}
+            if services_for_transaction_saga:
+                with metrics.timer("dialog_manager_stage_seconds", stage="transaction_saga"), \
+                        tracer.span("transaction_saga", services=services_for_transaction_saga):
+                    transaction_saga_results = transaction_saga.start(
+                        {
+                            "text" : text,
+                            "correlation_id" : correlation_id
+                        },
+                        services_for_transaction_saga
+                    )
 
-            selected_services_for_transaction = {service : services[service] for service in services_for_transaction_saga}
+            # Replacing the services names to the use case provided by them.
+            transaction_saga_results = {
+                service_to_function_mapping.get(key, key) : transaction_saga_results[key]
+                for key in transaction_saga_results
+            }
 
-            # Running the transaction saga.
-            transaction_saga_results = TransactionSaga(selected_services_for_transaction).start(
-                {
-                    "text" : text,
-                    "correlation_id" : correlation_id
-                }
-            )
+            # Keeping the fresh predictions in the in-process cache and scheduling their write into the caches.
+            for function in transaction_saga_results:
+                if transaction_saga_results[function] is not None and transaction_saga_results[function] is not TIMED_OUT:
+                    cache_manager.store(text, function, transaction_saga_results[function])
+                    cache_writer.put(text, function, transaction_saga_results[function])
 
             # Adding the cached value to the transaction results.
-            if len(cached_values) > 0:
-                for cached_key in cached_values:
-                    transaction_saga_results[cached_key] = cached_values[cached_key]
-
-            # Replacing the services names to the use case provided by them.
-            for key in transaction_saga_results:
-                if key in service_to_function_mapping:
-                    transaction_saga_results[service_to_function_mapping[key]] = transaction_saga_results[key]
-                    del transaction_saga_results[key]
+            transaction_saga_results.update(cached_values)
+
+            # Falling back to the default predictions for the failed or timed out sidecars.
+            for function in default_predictions:
+                if transaction_saga_results.get(function) is None or transaction_saga_results[function] is TIMED_OUT:
+                    metrics.increment(
+                        "dialog_manager_default_predictions",
+                        service=function,
+                        reason="timed_out" if transaction_saga_results.get(function) is TIMED_OUT else "failed"
+                    )
+                    transaction_saga_results[function] = default_predictions[function]
 
             intent = transaction_saga_results["intent"]
             ner = transaction_saga_results["ner"]
@@ -252,16 +530,19 @@ def message():
             print(f"NER - {ner}")
             print(f"sentiment - {sentiment}")
 
-            # Getting the last message sent by the user.
-            message = MessageModel.query.filter_by(user_id = user_id).order_by(MessageModel.date.desc()).first()
-
             # Getting the last state of the conversation.
-            last_state = message.state if message else "ANY"
+            last_state = conversation_store.get_state(user_id)
             print(f"Last state - {last_state}")
 
+            # Taking the dialog graph once, so a reload doesn't change it during the message.
+            dialog_graph = dialog_graphs.current
+
             # Getting the new state of the dialog.
-            new_state, ner = dialog_manager.get_new_state(last_state, intent, ner, sentiment)
+            with metrics.timer("dialog_manager_stage_seconds", stage="fsm_step"), tracer.span("fsm_step"):
+                new_state, ner = dialog_graph.dialog_manager.get_new_state(last_state, intent, ner, sentiment)
             print(f"New state - {new_state}")
+            trace.tag(last_state=last_state, state=new_state)
+            metrics.increment("dialog_manager_states_served", state=new_state)
 
             # Setting up some metrics for the fact table.
             is_seq2seq = False
@@ -269,9 +550,10 @@ def message():
             is_cached_dict["sequence"] = False
 
             # Checking to which category the new state is part of.
-            if new_state in full_state_request_creator.full_state_list:
+            responder = dialog_graph.responder(new_state)
+            if responder == "full_state":
                 # Getting the parameters for the Business Logic request.
-                params = full_state_request_creator.get_params_for_request(new_state, text, ner)
+                params = dialog_graph.full_state_request_creator.get_params_for_request(new_state, text, ner)
 
                 # Making the call to the Business Logice service.
                 business_logic_response = {}
@@ -279,10 +561,10 @@ def message():
 
                 # Getting the response.
                 response = "Response from business logic."
-            elif new_state in predefined_phrases_generator.servable_states:
+            elif responder == "predefined":
                 # Getting the predefined phrase for the state.
                 response = predefined_phrases_generator.get_phrase(new_state)
-            elif new_state == "SEQUENCE2SEQUENCE":
+            elif responder == "seq2seq":
                 # Getting the response from the NLG Service.
                 response = "Message from seq2seq"
                 is_seq2seq = True
@@ -302,8 +584,12 @@ def message():
                 new_state
             )
 
-            db.session.add(new_message)
-            db.session.commit()
+            with metrics.timer("dialog_manager_stage_seconds", stage="db_commit"), tracer.span("db_commit"):
+                db.session.add(new_message)
+                db.session.commit()
+
+            # Writing the committed turn through the conversation store.
+            conversation_store.record(user_id, ConversationTurn(text, intent, new_state, date))
 
             # Creation of the request payload to the Data Warehouse.
             data_for_data_warehouse = {
@@ -323,24 +609,13 @@ def message():
                 "telegram_user_id" : telegram_user_id
             }
 
-            # Computing the HMAC for the Data Warehouse.
-            new_message_data_warehouse_hmac = DATA_WAREHOUSE_DATA["security_manager"]._SecurityManager__encode_hmac(data_for_data_warehouse)
+            # Handing the fact to the Data Warehouse shipper.
+            with tracer.span("data_warehouse_ship"):
+                data_warehouse_shipper.ship("message", data_for_data_warehouse)
 
-            # Making the request to the Data Warehouse.
-            data_warehouse_response = requests.post(
-                f"http://{DATA_WAREHOUSE_DATA['host']}:{DATA_WAREHOUSE_DATA['port']}/message",
-                json = data_for_data_warehouse,
-                headers = {"Token" : new_message_data_warehouse_hmac}
-            )
-            print(data_warehouse_response.json())
-
-            # Sending the chosen response to the Telegram Interface.
-            telegram_interface_hmac = TELEGRAM_INTERFACE_DATA["security_manager"]._SecurityManager__encode_hmac({"text" : response, "chat_id" : chat_id})
-            telegram_response = requests.post(
-                f"http://{TELEGRAM_INTERFACE_DATA['host']}:{TELEGRAM_INTERFACE_DATA['port']}/send_response",
-                json = {"text" : response, "chat_id" : chat_id},
-                headers = {"Token" : telegram_interface_hmac}
-            )
+            # Handing the chosen response to the Telegram dispatcher.
+            with tracer.span("telegram_send"):
+                telegram_dispatcher.send(chat_id, response)
 
             return {
                 "text" : response,
@@ -383,6 +658,9 @@ def user():
             db.session.add(new_user)
             db.session.commit()
 
+            # Dropping the cached identity, as the user could have been cached as unregistered.
+            user_cache.invalidate(result["telegram_user_id"])
+
             # Creation of the request payload for the Data Warehouse.
             data_for_data_warehouse = {
                 "user_id" : user_id,
@@ -394,33 +672,20 @@ def user():
                 "app_id" : app_id
             }
 
-            # Computing the HMAC for the request to the Data Warehouse.
-            new_user_data_warehouse_hmac = DATA_WAREHOUSE_DATA["security_manager"]._SecurityManager__encode_hmac(data_for_data_warehouse)
+            # Handing the new user to the Data Warehouse shipper.
+            data_warehouse_shipper.ship("user", data_for_data_warehouse)
 
-            # Making the request to the Data Warehouse.
-            data_warehouse_response = requests.post(
-                f"http://{DATA_WAREHOUSE_DATA['host']}:{DATA_WAREHOUSE_DATA['port']}/user",
-                json = data_for_data_warehouse,
-                headers = {"Token" : new_user_data_warehouse_hmac}
-            )
-            print(data_warehouse_response.json())
-
-            # Computing the HMAC for the Telegram Interface request.
-            telegram_interface_hmac = TELEGRAM_INTERFACE_DATA["security_manager"]._SecurityManager__encode_hmac({"text" : "Hi, nice to meet you!", "chat_id" : result["chat_id"]})
-
-            # Sending the Welcoming message to the telegram interface.
-            telegram_response = requests.post(
-                f"http://{TELEGRAM_INTERFACE_DATA['host']}:{TELEGRAM_INTERFACE_DATA['port']}/send_response",
-                json = {"text" : "Hi, nice to meet you!", "chat_id" : result["chat_id"]},
-                headers = {"Token" : telegram_interface_hmac}
-            )
+            # Handing the Welcoming message to the Telegram dispatcher.
+            telegram_dispatcher.send(result["chat_id"], "Hi, nice to meet you!")
 
             return {
                 "message" : "OK!"
             }, 200
 
 # Running the application.
-app.run(
-    port = config.general.port,
-    host = config.general.host
-)
\ No newline at end of file
+if __name__ == "__main__":
+    start_service()
+    app.run(
+        port = config.general.port,
+        host = config.general.host
+    )
@@ -0,0 +1,229 @@
+# Importing all needed modules.
+from bisect import bisect_left
+import threading
+import time
+
+# The default upper bounds in seconds of the histograms buckets.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name : str, labels : tuple) -> None:
+        '''
+            The constructor of the Timer observing the duration of a block into a histogram.
+                :param metrics: Metrics
+                    The metrics registry receiving the observation.
+                :param name: str
+                    The name of the histogram.
+                :param labels: tuple
+                    The (label, value) pairs of the observation.
+        '''
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.observe_labels(self.name, time.perf_counter() - self.start, self.labels)
+
+
+class Metrics:
+    def __init__(self) -> None:
+        '''
+            The constructor of the Metrics registry.
+            Every thread records into its own shard without locking, the shards being merged on export.
+            The shards of the finished threads are folded into a base shard, so their number is bounded by the live threads.
+        '''
+        # The declared metrics as name -> (type, help, buckets).
+        self.definitions = {}
+
+        # The (thread, shard) pairs of the live threads and the merged shards of the finished ones,
+        # the lock guarding the list and the base shard.
+        self.local = threading.local()
+        self.shards = []
+        self.base = {}
+        self.shards_lock = threading.Lock()
+
+    def histogram(self, name : str, help : str, buckets : tuple = DEFAULT_BUCKETS) -> None:
+        '''
+            This function declares a histogram.
+                :param name: str
+                    The name of the histogram.
+                :param help: str
+                    The description of the histogram.
+                :param buckets: tuple, default = DEFAULT_BUCKETS
+                    The sorted upper bounds of the buckets.
+        '''
+        self.definitions[name] = ("histogram", help, tuple(buckets))
+
+    def counter(self, name : str, help : str) -> None:
+        '''
+            This function declares a counter.
+                :param name: str
+                    The name of the counter, without the _total suffix.
+                :param help: str
+                    The description of the counter.
+        '''
+        self.definitions[name] = ("counter", help, None)
+
+    def shard(self) -> dict:
+        '''
+            This function returns the shard of the calling thread, creating it on the first call.
+        '''
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            with self.shards_lock:
+                self.retire_shards()
+                self.shards.append((threading.current_thread(), shard))
+            return shard
+
+    def retire_shards(self) -> None:
+        '''
+            This function folds the shards of the finished threads into the base shard, the shards lock being held.
+        '''
+        live_shards = []
+        for thread, shard in self.shards:
+            if thread.is_alive():
+                live_shards.append((thread, shard))
+            else:
+                merge_shard(self.base, shard)
+        self.shards = live_shards
+
+    def observe_labels(self, name : str, value : float, labels : tuple) -> None:
+        '''
+            This function adds an observation to a histogram.
+                :param name: str
+                    The name of the histogram.
+                :param value: float
+                    The observed value.
+                :param labels: tuple
+                    The (label, value) pairs of the observation.
+        '''
+        shard = self.shard()
+        key = (name, labels)
+        series = shard.get(key)
+        if series is None:
+            # The series holds the count of every bucket, then the sum and the count of the observations.
+            series = shard[key] = [0] * (len(self.definitions[name][2]) + 3)
+        series[bisect_left(self.definitions[name][2], value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def observe(self, name : str, value : float, **labels) -> None:
+        '''
+            This function adds an observation to a histogram.
+                :param name: str
+                    The name of the histogram.
+                :param value: float
+                    The observed value.
+                :param labels: dict
+                    The labels of the observation.
+        '''
+        self.observe_labels(name, value, tuple(labels.items()))
+
+    def timer(self, name : str, **labels) -> Timer:
+        '''
+            This function returns a context manager observing the duration of its block.
+                :param name: str
+                    The name of the histogram.
+                :param labels: dict
+                    The labels of the observation.
+        '''
+        return Timer(self, name, tuple(labels.items()))
+
+    def increment(self, name : str, amount : float = 1, **labels) -> None:
+        '''
+            This function increments a counter.
+                :param name: str
+                    The name of the counter.
+                :param amount: float, default = 1
+                    The increment.
+                :param labels: dict
+                    The labels of the counter.
+        '''
+        shard = self.shard()
+        key = (name, tuple(labels.items()))
+        shard[key] = shard.get(key, 0) + amount
+
+    def collect(self) -> dict:
+        '''
+            This function merges the shards of all the threads.
+                :return: dict
+                    The mapping of the (name, labels) keys to their merged values.
+        '''
+        merged = {}
+        with self.shards_lock:
+            self.retire_shards()
+            merge_shard(merged, self.base)
+            for _, shard in self.shards:
+                # Copying the shard, as its thread may be adding series to it.
+                merge_shard(merged, shard.copy())
+        return merged
+
+    def export(self) -> str:
+        '''
+            This function renders the metrics in the Prometheus text format.
+                :return: str
+                    The exposition of all the declared metrics.
+        '''
+        merged = self.collect()
+        lines = []
+        for name, (kind, help, buckets) in self.definitions.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key in sorted((key for key in merged if key[0] == name), key=lambda key : key[1]):
+                labels = key[1]
+                if kind == "counter":
+                    lines.append(f"{name}_total{format_labels(labels)} {merged[key]}")
+                else:
+                    series, cumulative = merged[key], 0
+                    for bound, count in zip(buckets + ("+Inf",), series):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {series[-2]}")
+                    lines.append(f"{name}_count{format_labels(labels)} {series[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def merge_shard(merged : dict, shard : dict) -> None:
+    '''
+        This function adds the series of a shard to the merged series.
+            :param merged: dict
+                The merged series, updated in place.
+            :param shard: dict
+                The series of the shard.
+    '''
+    for key, value in shard.items():
+        if isinstance(value, list):
+            if key in merged:
+                merged[key] = [total + current for total, current in zip(merged[key], value)]
+            else:
+                merged[key] = list(value)
+        else:
+            merged[key] = merged.get(key, 0) + value
+
+
+def format_labels(labels : tuple) -> str:
+    '''
+        This function renders the labels of a series in the Prometheus text format.
+            :param labels: tuple
+                The (label, value) pairs of the series.
+    '''
+    if not labels:
+        return ""
+    rendered = []
+    for label, value in labels:
+        # Escaping the label value as required by the text format.
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        rendered.append(f'{label}="{value}"')
+    return "{" + ",".join(rendered) + "}"
+
+# The metrics registry shared by all the modules.
+metrics = Metrics()
@@ -0,0 +1,101 @@
+# Importing all needed modules.
+from concurrent.futures import ThreadPoolExecutor, Future
+import threading
+import queue
+import time
+
+from metrics import metrics
+
+# Declaring the metrics of the batches.
+metrics.histogram("dialog_manager_batch_size", "The number of requests sent in one batch.", (1, 2, 4, 8, 16, 32, 64, 128, 256))
+metrics.histogram("dialog_manager_batch_wait_seconds", "The time a request waited for its batch to be sent.")
+
+
+class MicroBatcher:
+    def __init__(self,
+                 name : str,
+                 send_batch,
+                 window : float = 0.005,
+                 max_batch_size : int = 32,
+                 max_concurrent_batches : int = 4) -> None:
+        '''
+            The constructor of the Micro Batcher grouping the concurrent requests to a service.
+                :param name: str
+                    The name of the batched service.
+                :param send_batch: callable
+                    The function sending a batch, called as send_batch(items) and returning
+                    the results in the order of the items.
+                :param window: float, default = 0.005
+                    The number of seconds the first request of a batch waits for other requests.
+                :param max_batch_size: int, default = 32
+                    The number of requests sending a batch before the end of its window.
+                :param max_concurrent_batches: int, default = 4
+                    The number of batches being sent at the same time.
+        '''
+        # Setting up the class fields.
+        self.name = name
+        self.send_batch = send_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.queue = queue.Queue()
+
+        # Creation of the executor sending the batches, so a slow batch doesn't delay the next ones.
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix="micro-batcher")
+
+        # Starting the thread collecting the batches.
+        threading.Thread(target=self.run, name=f"micro-batcher-{name}", daemon=True).start()
+
+    def submit(self, item) -> Future:
+        '''
+            This function adds a request to the next batch.
+                :param item: any
+                    The request.
+                :return: Future
+                    The future receiving the result of the request.
+        '''
+        future = Future()
+        self.queue.put((item, future, time.monotonic()))
+        return future
+
+    def run(self) -> None:
+        '''
+            This function collects the requests into batches and hands them to the executor.
+        '''
+        while True:
+            # Opening a batch with the first waiting request.
+            batch = [self.queue.get()]
+            closes_at = batch[0][2] + self.window
+
+            # Filling the batch until its window closes or it is full.
+            while len(batch) < self.max_batch_size:
+                remaining = closes_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Recording the size of the batch and the wait of its requests.
+            now = time.monotonic()
+            metrics.observe("dialog_manager_batch_size", len(batch), service=self.name)
+            for _, _, queued_at in batch:
+                metrics.observe("dialog_manager_batch_wait_seconds", now - queued_at, service=self.name)
+
+            self.executor.submit(self.dispatch, batch)
+
+    def dispatch(self, batch : list) -> None:
+        '''
+            This function sends a batch and routes every result back to its request.
+                :param batch: list
+                    The (item, future, queued_at) tuples of the batch.
+        '''
+        try:
+            results = self.send_batch([item for item, _, _ in batch])
+        except Exception as err:
+            # A failed batch fails all its requests, without stopping the batcher.
+            for _, future, _ in batch:
+                future.set_exception(err)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
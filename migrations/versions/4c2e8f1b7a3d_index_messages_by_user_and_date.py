@@ -0,0 +1,27 @@
+"""Index the messages by user and date
+
+Revision ID: 4c2e8f1b7a3d
+Revises:
+Create Date: 2026-10-17 16:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c2e8f1b7a3d'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The databases created by db.create_all after the index was added to the model already have it.
+    inspector = sa.inspect(op.get_bind())
+    if "ix_messages_user_id_date" not in {index["name"] for index in inspector.get_indexes("messages")}:
+        op.create_index("ix_messages_user_id_date", "messages", ["user_id", "date"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_messages_user_id_date", table_name="messages")
@@ -34,6 +34,11 @@ class MessageModel(db.Model):
     # Setting up the table name.
     __tablename__ = 'messages'
 
+    # Indexing the messages of a user by date for loading the last turns of a conversation.
+    __table_args__ = (
+        db.Index("ix_messages_user_id_date", "user_id", "date"),
+    )
+
     # Setting up the column names and data types.
     id = db.Column(db.String(64), primary_key=True)
     text = db.Column(db.Text, unique=False)
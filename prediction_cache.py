@@ -0,0 +1,135 @@
+# Importing all needed modules.
+from collections import OrderedDict
+import threading
+import time
+
+from codec import codec
+
+
+class PredictionCache:
+    def __init__(self, max_entries : int = 10000, max_bytes : int = 16777216, ttl : float = 300) -> None:
+        '''
+            The constructor of the in-process Prediction Cache.
+                :param max_entries: int, default = 10000
+                    The maximal number of predictions kept in memory.
+                :param max_bytes: int, default = 16777216
+                    The maximal estimated size in bytes of the kept predictions.
+                :param ttl: float, default = 300
+                    The number of seconds a prediction is served before expiring.
+        '''
+        # Setting up the limits of the cache.
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        # The entries are kept from the least to the most recently used.
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+        # Setting up the counters of the cache.
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def estimate_size(self, key : tuple, encoded : bytes) -> int:
+        '''
+            This function estimates the memory footprint in bytes of a cache entry.
+                :param key: tuple
+                    The (text, service) key of the entry.
+                :param encoded: bytes
+                    The serialized prediction stored in the entry.
+                :return: int
+                    The estimated size of the entry.
+        '''
+        return len(key[0].encode()) + len(key[1]) + len(encoded)
+
+    def get(self, text : str, service : str):
+        '''
+            This function returns the cached prediction of a service for a text.
+                :param text: str
+                    The text of the message.
+                :param service: str
+                    The name of the service.
+                :return: any
+                    A fresh copy of the prediction or None if it isn't cached or expired.
+        '''
+        key = (text, service)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            encoded, expires_at, size = entry
+            if expires_at < time.monotonic():
+                # Dropping the expired entry.
+                del self.entries[key]
+                self.size -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            # Marking the entry as the most recently used.
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+        # Decoding a new object on every hit, so a caller changing it can't corrupt the cache.
+        return codec.loads(encoded)
+
+    def set(self, text : str, service : str, prediction) -> None:
+        '''
+            This function stores the prediction of a service for a text.
+                :param text: str
+                    The text of the message.
+                :param service: str
+                    The name of the service.
+                :param prediction: any
+                    The prediction to store, None values are ignored.
+        '''
+        if prediction is None:
+            return
+        # Keeping the prediction serialized, so the stored value can't be changed by the caller.
+        key = (text, service)
+        encoded = codec.dumps(prediction)
+        size = self.estimate_size(key, encoded)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            # Replacing the older value of the entry.
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[2]
+            self.entries[key] = (encoded, time.monotonic() + self.ttl, size)
+            self.size += size
+
+            # Evicting the least recently used entries while the limits are exceeded.
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        '''
+            This function removes all the entries of the cache.
+        '''
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        '''
+            This function returns the counters of the cache.
+                :return: dict
+                    The entries count, size and hit/miss counters.
+        '''
+        with self.lock:
+            return {
+                "entries" : len(self.entries),
+                "bytes" : self.size,
+                "hits" : self.hits,
+                "misses" : self.misses,
+                "evictions" : self.evictions,
+                "expirations" : self.expirations
+            }
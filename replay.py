@@ -0,0 +1,267 @@
+# Importing all needed modules.
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from sqlalchemy import create_engine, select
+from collections import Counter
+from string import Formatter
+import argparse
+import json
+import time
+import re
+
+from dialog import DialogGraph
+from dialog.full_state_request import FullStateRequests
+from config import ConfigManager
+from models import MessageModel
+
+# The dialog graph, phrases patterns and Business Logic requests creator of the replay worker process.
+worker_graph = None
+worker_phrases = None
+worker_requests = FullStateRequests()
+
+def phrase_pattern(phrase : str):
+    '''
+        This function compiles a phrase template to a pattern matching the phrase with any values in its slots.
+            :param phrase: str
+                The phrase template, its slots being written as in str.format.
+            :return: re.Pattern
+                The pattern matching the whole filled phrase.
+    '''
+    parts = []
+    for literal, field, _, _ in Formatter().parse(phrase):
+        parts.append(re.escape(literal))
+        if field is not None:
+            parts.append(".*?")
+    return re.compile("".join(parts), re.DOTALL)
+
+def stored_responder(is_seq2seq : bool, business_logic_response) -> str:
+    '''
+        This function finds the responder that answered a stored message.
+            :param is_seq2seq: bool
+                If the message was answered by the NLG Service.
+            :param business_logic_response: dict
+                The response of the Business Logic, None if no request was sent.
+            :return: str
+                The responder of the message.
+    '''
+    if is_seq2seq:
+        return "seq2seq"
+    return "full_state" if business_logic_response is not None else "predefined"
+
+def business_logic_request(state : str, text : str, ner : dict) -> tuple:
+    '''
+        This function creates the Business Logic request the pipeline sends for a message.
+            :param state: str
+                The state of the dialog answered by the Business Logic.
+            :param text: str
+                The text of the message.
+            :param ner: dict
+                The post-processed named entities of the message.
+            :return: tuple
+                The state and the parameters of the request, None if the request can't be created.
+    '''
+    try:
+        return state, worker_requests.get_params_for_request(state, text, ner)
+    except (KeyError, IndexError, ValueError):
+        return None
+
+def init_worker(graph_filename : str, phrases_filename : str) -> None:
+    '''
+        This function loads the dialog graph to replay in a worker process.
+            :param graph_filename: str
+                The path to the dialog graph file.
+            :param phrases_filename: str
+                The path to the predefined phrases file.
+    '''
+    global worker_graph, worker_phrases
+    with open(phrases_filename, "r") as phrases_file:
+        phrases = json.load(phrases_file)
+    worker_graph = DialogGraph.from_file(graph_filename, phrases)
+    worker_phrases = {state : [phrase_pattern(phrase) for phrase in phrases[state]] for state in phrases}
+
+def replay_shard(conversations : list, max_samples : int = 20) -> dict:
+    '''
+        This function replays the conversations of a shard of users through the dialog graph.
+        Every message is replayed from the state stored for the previous message of the user,
+        so a divergence doesn't spread over the rest of the conversation.
+            :param conversations: list
+                The list of conversations, every conversation being the list of the
+                (text, intent, ner, is_seq2seq, response, business_logic_response, state) rows of a user
+                in date order.
+            :param max_samples: int, default = 20
+                The maximal number of divergent messages reported.
+            :return: dict
+                The counts of the replayed messages and divergences.
+    '''
+    transitions, stored = [], []
+    for conversation in conversations:
+        last_state = worker_graph.initial_state
+        for text, intent, ner, is_seq2seq, response, business_logic_response, state in conversation:
+            transitions.append((last_state, intent, ner or {}))
+            stored.append((text, stored_responder(is_seq2seq, business_logic_response), response, state))
+            last_state = state
+
+    # Replaying all the messages of the shard at once.
+    new_states = worker_graph.dialog_manager.get_new_states(transitions, post_process=False)
+
+    state_divergences = Counter()
+    responder_divergences = Counter()
+    response_divergences = 0
+    samples = []
+    for (last_state, intent, ner), (new_state, _), (text, stored_kind, response, state) in zip(transitions, new_states, stored):
+        # Checking if the new state is answered by the same responder as the stored message.
+        responder = worker_graph.responder(new_state)
+        if responder != stored_kind:
+            responder_divergences[(stored_kind, responder)] += 1
+            is_same_response = False
+        elif responder == "predefined":
+            # Checking if the response stored could be selected for the new state.
+            is_same_response = response is not None and any(pattern.fullmatch(response) for pattern in worker_phrases[new_state])
+        elif responder == "full_state":
+            # Checking if the new pipeline sends the same Business Logic request.
+            new_request = business_logic_request(new_state, text, ner)
+            is_same_response = new_request is not None and new_request == business_logic_request(state, text, ner)
+        else:
+            is_same_response = True
+        if not is_same_response:
+            response_divergences += 1
+
+        if new_state != state:
+            state_divergences[(state, new_state)] += 1
+        if (new_state != state or not is_same_response) and len(samples) < max_samples:
+            samples.append({"text" : text, "intent" : intent, "last_state" : last_state,
+                            "stored_state" : state, "replayed_state" : new_state,
+                            "stored_responder" : stored_kind, "replayed_responder" : responder})
+    return {
+        "messages" : len(transitions),
+        "users" : len(conversations),
+        "state_divergences" : state_divergences,
+        "responder_divergences" : responder_divergences,
+        "response_divergences" : response_divergences,
+        "samples" : samples
+    }
+
+def stream_conversations(engine, shard_size : int, limit : int = None):
+    '''
+        This function streams the stored messages grouped into shards of whole conversations.
+        A server-side cursor is used, so only the current shard is held in memory.
+            :param engine: sqlalchemy.engine.Engine
+                The engine of the Data Base.
+            :param shard_size: int
+                The minimal number of messages of a shard.
+            :param limit: int, default = None
+                The maximal number of messages to stream.
+            :return: generator
+                The shards, as lists of conversations.
+    '''
+    messages = MessageModel.__table__
+    query = select(
+        messages.c.user_id, messages.c.text, messages.c.intent, messages.c.ner,
+        messages.c.is_seq2seq, messages.c.response, messages.c.business_logic_response, messages.c.state
+    ).order_by(messages.c.user_id, messages.c.date)
+    if limit is not None:
+        query = query.limit(limit)
+
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=shard_size).execute(query)
+        shard, shard_messages = [], 0
+        conversation, conversation_user = [], None
+        for user_id, *row in result:
+            if user_id != conversation_user and conversation:
+                # Closing the conversation of the previous user and the shard if it is full.
+                shard.append(conversation)
+                shard_messages += len(conversation)
+                conversation = []
+                if shard_messages >= shard_size:
+                    yield shard
+                    shard, shard_messages = [], 0
+            conversation_user = user_id
+            conversation.append(tuple(row))
+        if conversation:
+            shard.append(conversation)
+        if shard:
+            yield shard
+
+def replay(database_uri : str, graph_filename : str, phrases_filename : str,
+           workers : int = 4, shard_size : int = 5000, limit : int = None) -> dict:
+    '''
+        This function replays the stored conversations through a dialog graph in a process pool.
+            :param database_uri: str
+                The uri of the Data Base holding the messages.
+            :param graph_filename: str
+                The path to the dialog graph file to check.
+            :param phrases_filename: str
+                The path to the predefined phrases file to check.
+            :param workers: int, default = 4
+                The number of replay processes.
+            :param shard_size: int, default = 5000
+                The number of messages replayed by a process at once.
+            :param limit: int, default = None
+                The maximal number of messages to replay.
+            :return: dict
+                The report of the replay.
+    '''
+    engine = create_engine(database_uri)
+    report = {"messages" : 0, "users" : 0, "state_divergences" : Counter(), "responder_divergences" : Counter(),
+              "response_divergences" : 0, "samples" : []}
+    start = time.perf_counter()
+
+    def merge(shard_report : dict) -> None:
+        for key in ["messages", "users", "response_divergences"]:
+            report[key] += shard_report[key]
+        report["state_divergences"].update(shard_report["state_divergences"])
+        report["responder_divergences"].update(shard_report["responder_divergences"])
+        report["samples"].extend(shard_report["samples"][:20 - len(report["samples"])])
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(graph_filename, phrases_filename)) as executor:
+        pending = set()
+        for shard in stream_conversations(engine, shard_size, limit):
+            # Bounding the shards in flight to bound the memory.
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge(future.result())
+            pending.add(executor.submit(replay_shard, shard))
+        for future in pending:
+            merge(future.result())
+
+    elapsed = time.perf_counter() - start
+    return {
+        "messages" : report["messages"],
+        "users" : report["users"],
+        "state_divergences" : sum(report["state_divergences"].values()),
+        "state_divergences_by_transition" : [
+            {"stored_state" : stored, "replayed_state" : replayed, "count" : count}
+            for (stored, replayed), count in report["state_divergences"].most_common(20)
+        ],
+        "responder_divergences" : [
+            {"stored_responder" : stored, "replayed_responder" : replayed, "count" : count}
+            for (stored, replayed), count in report["responder_divergences"].most_common()
+        ],
+        "response_divergences" : report["response_divergences"],
+        "samples" : report["samples"],
+        "seconds" : round(elapsed, 3),
+        "messages_per_second" : round(report["messages"] / elapsed, 1) if elapsed else 0.0
+    }
+
+if __name__ == "__main__":
+    # Parsing the command line arguments.
+    argument_parser = argparse.ArgumentParser(description="Replays the stored conversations through a dialog graph.")
+    argument_parser.add_argument("--config", default="config.ini", help="The configuration file with the Data Base credentials.")
+    argument_parser.add_argument("--graph", default="dialog_graph.json", help="The dialog graph to check.")
+    argument_parser.add_argument("--phrases", default="predefined_phrases.json", help="The predefined phrases to check.")
+    argument_parser.add_argument("--workers", type=int, default=4, help="The number of replay processes.")
+    argument_parser.add_argument("--shard-size", type=int, default=5000, help="The number of messages per shard.")
+    argument_parser.add_argument("--limit", type=int, default=None, help="The maximal number of messages to replay.")
+    args = argument_parser.parse_args()
+
+    config = ConfigManager(args.config)
+    database_uri = getattr(
+        config.database, "uri",
+        f"postgresql://{config.database.username}:{config.database.password}@{config.database.host}/{config.database.db_name}"
+    )
+
+    print(json.dumps(
+        replay(database_uri, args.graph, args.phrases, args.workers, args.shard_size, args.limit),
+        indent=2
+    ))
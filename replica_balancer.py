@@ -0,0 +1,116 @@
+# Importing all needed modules.
+import threading
+import time
+
+
+class Replica:
+    __slots__ = ("host", "port", "in_flight", "latency", "failures", "ejected_until", "requests_count", "ejections")
+
+    def __init__(self, host : str, port : int) -> None:
+        '''
+            The constructor of a Replica of a service.
+                :param host: str
+                    The host of the replica.
+                :param port: int
+                    The port of the replica.
+        '''
+        self.host = host
+        self.port = port
+        self.in_flight = 0
+        self.latency = 0.0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests_count = 0
+        self.ejections = 0
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+
+class ReplicaBalancer:
+    def __init__(self,
+                 replicas : list,
+                 ewma_alpha : float = 0.3,
+                 eject_failures : int = 5,
+                 eject_duration : float = 10.0) -> None:
+        '''
+            The constructor of the Replica Balancer choosing the replica of every request to a service.
+            The replica with the least outstanding requests is chosen, the lowest average latency breaking ties.
+                :param replicas: list
+                    The {"host", "port"} dictionaries of the replicas.
+                :param ewma_alpha: float, default = 0.3
+                    The weight of the last latency in the moving average of a replica.
+                :param eject_failures: int, default = 5
+                    The number of consecutive failures ejecting a replica.
+                :param eject_duration: float, default = 10.0
+                    The number of seconds an ejected replica isn't chosen.
+        '''
+        self.replicas = [Replica(replica["host"], replica["port"]) for replica in replicas]
+        self.ewma_alpha = ewma_alpha
+        self.eject_failures = eject_failures
+        self.eject_duration = eject_duration
+        self.lock = threading.Lock()
+
+    def acquire(self, exclude : Replica = None) -> Replica:
+        '''
+            This function chooses a replica and counts the request as outstanding on it.
+            The ejected replicas are skipped unless all the replicas are ejected.
+                :param exclude: Replica, default = None
+                    A replica to avoid if another one is available, as the replica of a hedged request.
+                :return: Replica
+                    The chosen replica, to be given back to release.
+        '''
+        now = time.monotonic()
+        with self.lock:
+            candidates = [replica for replica in self.replicas if replica.ejected_until <= now and replica is not exclude] \
+                or [replica for replica in self.replicas if replica is not exclude] \
+                or self.replicas
+            replica = min(candidates, key=lambda replica : (replica.in_flight, replica.latency))
+            replica.in_flight += 1
+            replica.requests_count += 1
+            return replica
+
+    def release(self, replica : Replica, succeeded : bool, latency : float) -> None:
+        '''
+            This function records the outcome of a request to a replica.
+                :param replica: Replica
+                    The replica given by acquire.
+                :param succeeded: bool
+                    True if the replica answered successfully.
+                :param latency: float
+                    The number of seconds the request took.
+        '''
+        with self.lock:
+            replica.in_flight -= 1
+            if succeeded:
+                replica.failures = 0
+                replica.latency = latency if replica.latency == 0.0 else \
+                    self.ewma_alpha * latency + (1 - self.ewma_alpha) * replica.latency
+            else:
+                replica.failures += 1
+                if replica.failures >= self.eject_failures:
+                    # Ejecting the replica, a single failure after its return ejecting it again.
+                    replica.failures = self.eject_failures - 1
+                    replica.ejected_until = time.monotonic() + self.eject_duration
+                    replica.ejections += 1
+
+    def stats(self) -> list:
+        '''
+            This function returns the state of the replicas.
+                :return: list
+                    The address, outstanding requests, average latency, requests and ejections counts of every replica.
+        '''
+        now = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    "address" : replica.address,
+                    "in_flight" : replica.in_flight,
+                    "latency" : replica.latency,
+                    "requests" : replica.requests_count,
+                    "ejected" : replica.ejected_until > now,
+                    "ejections" : replica.ejections
+                }
+                for replica in self.replicas
+            ]
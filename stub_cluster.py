@@ -0,0 +1,305 @@
+# Importing all needed modules.
+from werkzeug.serving import make_server
+from flask import Flask, Response, request
+import threading
+import random
+import time
+
+from cerber import SecurityManager
+from codec import codec, MSGPACK_BACKEND, MSGPACK_CONTENT_TYPE
+
+
+class LatencyRecorder:
+    def __init__(self) -> None:
+        '''
+            The constructor of the Latency Recorder, keeping the latencies of the stubs by stage.
+        '''
+        self.latencies = {}
+        self.failures = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage : str, latency : float, failed : bool) -> None:
+        '''
+            This function records the handling of a request by a stub.
+                :param stage: str
+                    The name of the stage (service and endpoint).
+                :param latency: float
+                    The number of seconds the request took.
+                :param failed: bool
+                    True if the stub answered with an error.
+        '''
+        with self.lock:
+            self.latencies.setdefault(stage, []).append(latency)
+            if failed:
+                self.failures[stage] = self.failures.get(stage, 0) + 1
+
+
+class StubService:
+    def __init__(self,
+                 name : str,
+                 secret_key : str,
+                 recorder : LatencyRecorder,
+                 latency_ms : float = 5.0,
+                 latency_sigma : float = 0.5,
+                 failure_rate : float = 0.0,
+                 host : str = "127.0.0.1") -> None:
+        '''
+            The constructor of a Stub Service standing for a service of the cluster.
+                :param name: str
+                    The name of the service in the Service Discovery.
+                :param secret_key: str
+                    The secret key used to verify the HMAC of the requests.
+                :param recorder: LatencyRecorder
+                    The recorder of the stages latencies.
+                :param latency_ms: float, default = 5.0
+                    The median latency added to every request, in milliseconds.
+                :param latency_sigma: float, default = 0.5
+                    The sigma of the log-normal distribution of the added latency.
+                :param failure_rate: float, default = 0.0
+                    The probability of a request to fail with a 500 status code.
+                :param host: str, default = "127.0.0.1"
+                    The host the stub listens on.
+        '''
+        # Setting up the class fields.
+        self.name = name
+        self.secret_key = secret_key
+        self.security_manager = SecurityManager(secret_key)
+        self.recorder = recorder
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.failure_rate = failure_rate
+        self.host = host
+        self.app = Flask(name)
+        self.server = None
+
+    def route(self, rule : str, methods : list, handler) -> None:
+        '''
+            This function adds an endpoint verifying the HMAC, adding the latency and injecting the failures.
+                :param rule: str
+                    The url rule of the endpoint.
+                :param methods: list
+                    The HTTP methods of the endpoint.
+                :param handler: callable
+                    The function returning the response body from the request body.
+        '''
+        def endpoint(**kwargs):
+            start = time.perf_counter()
+            check_response = self.security_manager.check_request(request)
+            if check_response != "OK":
+                return check_response, check_response["code"]
+
+            # Adding the latency and the failures of the service.
+            if self.latency_ms > 0:
+                time.sleep(random.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000)
+            failed = random.random() < self.failure_rate
+            if failed:
+                response = {"message" : "Injected failure"}, 500
+            else:
+                response = handler(codec.decode(request.get_data(), request.content_type), **kwargs)
+            self.recorder.record(f"{self.name} {rule}", time.perf_counter() - start, failed or response[1] >= 500)
+
+            # Answering the binary requests in the same encoding.
+            if request.content_type == MSGPACK_CONTENT_TYPE:
+                return Response(MSGPACK_BACKEND[0](response[0]), status=response[1], content_type=MSGPACK_CONTENT_TYPE)
+            return response
+
+        self.app.add_url_rule(rule, f"{request_name(rule)}", endpoint, methods=methods)
+
+    def start(self) -> None:
+        '''
+            This function starts the stub on a free port in a background thread.
+        '''
+        self.server = make_server(self.host, 0, self.app, threaded=True)
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, name=self.name, daemon=True).start()
+
+    def stop(self) -> None:
+        '''
+            This function stops the stub.
+        '''
+        if self.server is not None:
+            self.server.shutdown()
+
+    def credentials(self) -> dict:
+        '''
+            This function returns the credentials of the stub as given by the Service Discovery.
+                :return: dict
+                    The general and security configurations of the stub.
+        '''
+        return {
+            "general" : {"host" : self.host, "port" : self.port, "name" : self.name},
+            "security" : {"secret_key" : self.secret_key}
+        }
+
+
+def request_name(rule : str) -> str:
+    '''
+        This function converts an url rule into a Flask endpoint name.
+            :param rule: str
+                The url rule.
+            :return: str
+                The endpoint name.
+    '''
+    return rule.strip("/").replace("/", "_").replace("<", "").replace(">", "") or "index"
+
+
+class StubCluster:
+    # The names of the services stubbed for the dialog manager.
+    CACHES = ["cache-service-1", "cache-service-2"]
+    SIDECARS = ["intent-sidecar-service", "named-entity-recognition-sidecar-service", "sentiment-sidecar-service"]
+
+    # The intents predicted by the intent sidecar stub from keywords of the text.
+    INTENT_KEYWORDS = [
+        ("bye", "goodbye"), ("thank", "thank_you"), ("hi", "greeting"), ("hello", "greeting"),
+        ("exercise", "get_exercise"), ("meal", "get_meals"), ("progress", "get_goal_progress"),
+        ("update", "update_parameters"), ("stats", "get_stats"), ("burn", "kcals_burned"),
+        ("tired", "tired"), ("angry", "angry"), ("good", "good")
+    ]
+
+    def __init__(self,
+                 service_discovery_key : str,
+                 latency_ms : float = 5.0,
+                 latency_sigma : float = 0.5,
+                 failure_rate : float = 0.0,
+                 overrides : dict = None,
+                 sidecar_replicas : int = 1) -> None:
+        '''
+            The constructor of the Stub Cluster standing for all the services used by the dialog manager.
+                :param service_discovery_key: str
+                    The secret key of the Service Discovery.
+                :param latency_ms: float, default = 5.0
+                    The median latency of the services, in milliseconds.
+                :param latency_sigma: float, default = 0.5
+                    The sigma of the log-normal distribution of the latencies.
+                :param failure_rate: float, default = 0.0
+                    The probability of a request to fail.
+                :param overrides: dict, default = None
+                    The mapping of service names to a dictionary overriding their
+                    latency_ms, latency_sigma and failure_rate.
+                :param sidecar_replicas: int, default = 1
+                    The number of replicas of every sidecar.
+        '''
+        self.recorder = LatencyRecorder()
+        overrides = overrides if overrides is not None else {}
+
+        def stub(name, secret_key):
+            options = {"latency_ms" : latency_ms, "latency_sigma" : latency_sigma, "failure_rate" : failure_rate}
+            options.update(overrides.get(name, {}))
+            return StubService(name, secret_key, self.recorder, **options)
+
+        # Creation of the Service Discovery, which doesn't add latency.
+        self.service_discovery = StubService("service-discovery", service_discovery_key, self.recorder, latency_ms=0)
+        self.service_discovery.route("/register", ["POST"], lambda body : ({"message" : "OK"}, 200))
+        self.service_discovery.route("/heartbeat/<name>", ["POST"], lambda body, name : ({"message" : "OK"}, 200))
+        self.service_discovery.route("/get_services", ["GET"], self.get_services)
+
+        # Creation of the caches.
+        self.services = {}
+        for name in self.CACHES:
+            cache = stub(name, f"{name}-key")
+            store = {}
+            cache.route("/cache", ["GET"], lambda body, store=store : self.cache_get(store, body))
+            cache.route("/cache_batch", ["GET", "POST"], lambda body, store=store : self.cache_batch(store, body))
+            self.services[name] = cache
+
+        # Creation of the sidecars, the first replica being the one registered under the sidecar name.
+        self.replicas = {}
+        for name, predict in zip(self.SIDECARS, [self.predict_intent, self.predict_entities, lambda text : 0.5]):
+            self.replicas[name] = []
+            for index in range(max(1, sidecar_replicas)):
+                sidecar = stub(name, f"{name}-key")
+                sidecar.route("/serve", ["POST"], lambda body, predict=predict : ({"prediction" : predict(body["text"])}, 200))
+                sidecar.route("/serve_batch", ["POST"], lambda body, predict=predict : ({"predictions" : {
+                    item["correlation_id"] : predict(item["text"]) for item in body["items"]
+                }}, 200))
+                self.services[name if index == 0 else f"{name}-{index}"] = sidecar
+                self.replicas[name].append(sidecar)
+
+        # Creation of the sinks.
+        data_warehouse = stub("data-warehouse-service", "data-warehouse-service-key")
+        for rule in ["/bulk", "/message", "/user"]:
+            data_warehouse.route(rule, ["POST"], lambda body : ({"message" : "OK"}, 200))
+        self.services["data-warehouse-service"] = data_warehouse
+
+        telegram_interface = stub("telegram_interface", "telegram_interface-key")
+        telegram_interface.route("/send_response", ["POST"], lambda body : ({"message" : "OK"}, 200))
+        self.services["telegram_interface"] = telegram_interface
+
+    def predict_intent(self, text : str) -> str:
+        '''
+            This function predicts the intent of a text from its keywords.
+                :param text: str
+                    The text of the message.
+                :return: str
+                    The intent of the text.
+        '''
+        text = text.lower()
+        for keyword, intent in self.INTENT_KEYWORDS:
+            if keyword in text:
+                return intent
+        return "oos"
+
+    def predict_entities(self, text : str) -> dict:
+        '''
+            This function extracts the named entities of a text from its words.
+                :param text: str
+                    The text of the message.
+                :return: dict
+                    The DATE, CARDINAL and NOUNS entities of the text.
+        '''
+        entities = {}
+        for word in text.lower().split():
+            if word in ["today", "tomorrow", "yesterday", "monday", "friday"]:
+                entities.setdefault("DATE", []).append(word)
+            elif word.replace(".", "", 1).isdigit():
+                entities.setdefault("CARDINAL", []).append(word)
+            elif word in ["weight", "height", "stats"]:
+                entities.setdefault("NOUNS", []).append(word)
+        return entities
+
+    def cache_get(self, store : dict, body : dict) -> tuple:
+        '''
+            This function serves a cache lookup.
+        '''
+        key = (body["text"], body["service"])
+        if key in store:
+            return {"prediction" : store[key]}, 200
+        return {"message" : "Not found"}, 404
+
+    def cache_batch(self, store : dict, body : dict) -> tuple:
+        '''
+            This function serves a batched cache lookup or write.
+        '''
+        if "items" in body:
+            for item in body["items"]:
+                store[(item["text"], item["service"])] = item["prediction"]
+            return {"message" : "OK"}, 200
+        return {"predictions" : {service : store.get((body["text"], service)) for service in body["services"]}}, 200
+
+    def get_services(self, body : dict) -> tuple:
+        '''
+            This function serves the credentials of the requested services.
+        '''
+        services = {name : self.services[name].credentials() for name in body["service_names"] if name in self.services}
+
+        # Listing the replicas of the sidecars.
+        for name in services:
+            if len(self.replicas.get(name, [])) > 1:
+                services[name]["replicas"] = [{"host" : replica.host, "port" : replica.port} for replica in self.replicas[name]]
+        return services, 200
+
+    def start(self) -> None:
+        '''
+            This function starts all the stubs.
+        '''
+        self.service_discovery.start()
+        for name in self.services:
+            self.services[name].start()
+
+    def stop(self) -> None:
+        '''
+            This function stops all the stubs.
+        '''
+        self.service_discovery.stop()
+        for name in self.services:
+            self.services[name].stop()
@@ -0,0 +1,146 @@
+# Importing all needed modules.
+from http_client import HttpClient
+from metrics import metrics
+import threading
+import requests
+import queue
+import time
+
+# Declaring the metrics of the sinks.
+metrics.histogram("dialog_manager_sink_request_seconds", "The duration of the requests to the Data Warehouse and the Telegram Interface.")
+
+
+class TelegramDispatcher:
+    def __init__(self,
+                 telegram_interface_data : dict,
+                 http_client : HttpClient = None,
+                 workers : int = 8,
+                 max_retries : int = 3,
+                 backoff : float = 0.2,
+                 max_queue : int = 10000) -> None:
+        '''
+            The constructor of the Telegram Dispatcher.
+                :param telegram_interface_data: dict
+                    The credentials of the Telegram Interface (host, port and security manager).
+                :param http_client: HttpClient, default = None
+                    The shared HTTP client used to call the Telegram Interface.
+                :param workers: int, default = 8
+                    The number of threads sending the responses.
+                    The responses of a chat are always sent by the same thread to keep their order.
+                :param max_retries: int, default = 3
+                    The number of retries of a failed response.
+                :param backoff: float, default = 0.2
+                    The number of seconds before the first retry, doubled at every retry.
+                :param max_queue: int, default = 10000
+                    The maximal number of pending responses per worker, the new ones being dropped past it.
+        '''
+        # Setting up the class fields.
+        self.telegram_interface_data = telegram_interface_data
+        self.http_client = http_client if http_client is not None else HttpClient()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.queues = [queue.Queue(maxsize=max_queue) for _ in range(workers)]
+
+        # Setting up the counters of the dispatcher.
+        self.counters_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.total_delay = 0.0
+
+        # Starting the threads sending the responses.
+        for worker_queue in self.queues:
+            threading.Thread(target=self.run, args=(worker_queue,), name="telegram-dispatcher", daemon=True).start()
+
+    def send(self, chat_id : int, text : str) -> None:
+        '''
+            This function schedules a response to a chat without blocking.
+            The response is dropped if the queue of the worker is full.
+                :param chat_id: int
+                    The id of the chat to send the response to.
+                :param text: str
+                    The text of the response.
+        '''
+        # Choosing the worker responsible for the chat.
+        worker_queue = self.queues[hash(chat_id) % len(self.queues)]
+        try:
+            worker_queue.put_nowait((chat_id, text, time.monotonic()))
+        except queue.Full:
+            with self.counters_lock:
+                self.dropped += 1
+
+    def post(self, chat_id : int, text : str) -> bool:
+        '''
+            This function sends a response to the Telegram Interface.
+                :param chat_id: int
+                    The id of the chat to send the response to.
+                :param text: str
+                    The text of the response.
+                :return: bool
+                    True if the Telegram Interface accepted the response.
+        '''
+        data_json = {"text" : text, "chat_id" : chat_id}
+
+        # Serializing the request once and signing the sent bytes.
+        body, headers = self.telegram_interface_data["security_manager"].sign_request(data_json)
+
+        # Sending the response to the Telegram Interface.
+        try:
+            with metrics.timer("dialog_manager_sink_request_seconds", sink="telegram"):
+                response = self.http_client.post(
+                    f"http://{self.telegram_interface_data['host']}:{self.telegram_interface_data['port']}/send_response",
+                    data = body,
+                    headers = headers
+                )
+        except requests.RequestException:
+            return False
+        return response.status_code == 200
+
+    def run(self, worker_queue : queue.Queue) -> None:
+        '''
+            This function sends the responses of the worker queue one after another.
+                :param worker_queue: queue.Queue
+                    The queue of the responses of the chats the worker is responsible for.
+        '''
+        while True:
+            chat_id, text, queued_at = worker_queue.get()
+
+            # Sending the response, retrying with an exponential backoff.
+            is_sent = False
+            for attempt in range(self.max_retries + 1):
+                if attempt > 0:
+                    with self.counters_lock:
+                        self.retries += 1
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+                try:
+                    is_sent = self.post(chat_id, text)
+                except Exception as err:
+                    # A failed response must not stop the worker.
+                    print(f"Telegram dispatcher failed - {err}")
+                if is_sent:
+                    break
+
+            # Updating the counters.
+            with self.counters_lock:
+                if is_sent:
+                    self.sent += 1
+                    self.total_delay += time.monotonic() - queued_at
+                else:
+                    self.failed += 1
+
+    def stats(self) -> dict:
+        '''
+            This function returns the counters of the dispatcher.
+                :return: dict
+                    The pending, sent, failed, dropped responses counts, the retries count and the mean delivery delay.
+        '''
+        with self.counters_lock:
+            return {
+                "pending" : sum(worker_queue.qsize() for worker_queue in self.queues),
+                "sent" : self.sent,
+                "failed" : self.failed,
+                "dropped" : self.dropped,
+                "retries" : self.retries,
+                "mean_delay" : self.total_delay / self.sent if self.sent else 0.0
+            }
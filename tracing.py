@@ -0,0 +1,303 @@
+# Importing all needed modules.
+from collections import deque
+import contextvars
+import threading
+import random
+import time
+
+from codec import codec
+
+# The trace of the message being processed, propagated to the executors with the context.
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "name", "tags", "start", "duration")
+
+    def __init__(self, trace, name : str, tags : dict) -> None:
+        '''
+            The constructor of a Span timing one stage or outbound call of a trace.
+                :param trace: Trace
+                    The trace the span is part of.
+                :param name: str
+                    The name of the stage or of the call.
+                :param tags: dict
+                    The tags of the span.
+        '''
+        self.trace = trace
+        self.name = name
+        self.tags = tags
+        self.duration = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.tags["error"] = exc_type.__name__
+        self.trace.spans.append(self)
+
+    def tag(self, **tags) -> None:
+        '''
+            This function adds tags to the span.
+        '''
+        self.tags.update(tags)
+
+    def to_dict(self) -> dict:
+        '''
+            This function returns the span as a dictionary, its start being relative to the trace start.
+        '''
+        return {
+            "name" : self.name,
+            "start" : self.start - self.trace.start,
+            "duration" : self.duration,
+            "tags" : self.tags
+        }
+
+
+class NoopSpan:
+    '''
+        The span returned when the message isn't traced, recording nothing.
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+    def tag(self, **tags) -> None:
+        pass
+
+
+NOOP_SPAN = NoopSpan()
+
+
+class Trace:
+    def __init__(self, correlation_id : str, tags : dict) -> None:
+        '''
+            The constructor of the Trace of one message.
+                :param correlation_id: str
+                    The correlation id of the message.
+                :param tags: dict
+                    The tags of the trace, as the telegram user id and the dialog state.
+        '''
+        self.correlation_id = correlation_id
+        self.tags = tags
+        self.spans = []
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def tag(self, **tags) -> None:
+        '''
+            This function adds tags to the trace.
+        '''
+        self.tags.update(tags)
+
+    def to_dict(self) -> dict:
+        '''
+            This function returns the trace and its spans as a dictionary.
+        '''
+        return {
+            "correlation_id" : self.correlation_id,
+            "timestamp" : self.timestamp,
+            "duration" : self.duration,
+            "tags" : self.tags,
+            "spans" : [span.to_dict() for span in sorted(self.spans, key=lambda span : span.start)]
+        }
+
+
+class NoopTrace:
+    '''
+        The trace returned when the message isn't sampled, recording nothing.
+    '''
+    def tag(self, **tags) -> None:
+        pass
+
+
+NOOP_TRACE = NoopTrace()
+
+
+class TraceContext:
+    __slots__ = ("tracer", "trace", "token")
+
+    def __init__(self, tracer, trace : Trace) -> None:
+        '''
+            The constructor of the context making a trace current while a message is processed.
+                :param tracer: Tracer
+                    The tracer exporting the trace when the message is processed.
+                :param trace: Trace
+                    The trace of the message, None if the message isn't sampled.
+        '''
+        self.tracer = tracer
+        self.trace = trace
+
+    def __enter__(self):
+        if self.trace is None:
+            return NOOP_TRACE
+        self.token = current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if self.trace is None:
+            return
+        current_trace.reset(self.token)
+        self.trace.duration = time.perf_counter() - self.trace.start
+        if exc_type is not None:
+            self.trace.tags["error"] = exc_type.__name__
+        self.tracer.finish(self.trace)
+
+
+class RingBufferExporter:
+    def __init__(self, capacity : int = 1000) -> None:
+        '''
+            The constructor of the exporter keeping the last finished traces in memory.
+                :param capacity: int, default = 1000
+                    The number of traces kept, the oldest ones being dropped.
+        '''
+        self.traces = deque(maxlen=capacity)
+
+    def export(self, trace : dict) -> None:
+        '''
+            This function keeps a finished trace.
+                :param trace: dict
+                    The finished trace.
+        '''
+        self.traces.append(trace)
+
+    def find(self, correlation_id : str) -> dict:
+        '''
+            This function returns the kept trace of a message.
+                :param correlation_id: str
+                    The correlation id of the message.
+                :return: dict
+                    The trace or None if it isn't kept.
+        '''
+        for trace in reversed(list(self.traces)):
+            if trace["correlation_id"] == correlation_id:
+                return trace
+        return None
+
+    def latest(self, limit : int = 100) -> list:
+        '''
+            This function returns the last finished traces, the newest first.
+                :param limit: int, default = 100
+                    The maximal number of traces returned.
+        '''
+        return list(reversed(list(self.traces)))[:limit]
+
+
+class FileExporter:
+    def __init__(self, path : str = "traces.jsonl") -> None:
+        '''
+            The constructor of the exporter appending the finished traces to a JSON lines file.
+                :param path: str, default = "traces.jsonl"
+                    The path of the file.
+        '''
+        self.path = path
+        self.lock = threading.Lock()
+
+    def export(self, trace : dict) -> None:
+        '''
+            This function appends a finished trace to the file.
+                :param trace: dict
+                    The finished trace.
+        '''
+        line = codec.dumps_str(trace) + "\n"
+        with self.lock:
+            with open(self.path, "a") as traces_file:
+                traces_file.write(line)
+
+
+class Tracer:
+    def __init__(self, exporter = None, sample_rate : float = 0.01) -> None:
+        '''
+            The constructor of the Tracer.
+                :param exporter: RingBufferExporter or FileExporter, default = None
+                    The exporter receiving the finished traces, a RingBufferExporter if None.
+                    Any object with an export(trace : dict) method can be used.
+                :param sample_rate: float, default = 0.01
+                    The share of the messages traced, decided when the message arrives.
+        '''
+        self.exporter = exporter if exporter is not None else RingBufferExporter()
+        self.sample_rate = sample_rate
+
+        # Setting up the counters of the tracer.
+        self.counters_lock = threading.Lock()
+        self.exported = 0
+        self.failed = 0
+
+    def configure(self, exporter = None, sample_rate : float = 0.01) -> None:
+        '''
+            This function switches the exporter and the sample rate of the tracer.
+                :param exporter: RingBufferExporter or FileExporter, default = None
+                    The exporter receiving the finished traces, a RingBufferExporter if None.
+                :param sample_rate: float, default = 0.01
+                    The share of the messages traced.
+        '''
+        self.exporter = exporter if exporter is not None else RingBufferExporter()
+        self.sample_rate = sample_rate
+
+    def trace(self, correlation_id : str, **tags) -> TraceContext:
+        '''
+            This function starts the trace of a message if the message is sampled.
+                :param correlation_id: str
+                    The correlation id of the message.
+                :param tags: dict
+                    The tags of the trace.
+                :return: TraceContext
+                    The context making the trace current, yielding NOOP_TRACE if the message isn't sampled.
+        '''
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return TraceContext(self, None)
+        return TraceContext(self, Trace(correlation_id, tags))
+
+    def span(self, name : str, **tags):
+        '''
+            This function returns a span of the current trace.
+                :param name: str
+                    The name of the stage or of the call.
+                :param tags: dict
+                    The tags of the span.
+                :return: Span
+                    The span to use as a context manager, NOOP_SPAN if no trace is current.
+        '''
+        trace = current_trace.get()
+        if trace is None:
+            return NOOP_SPAN
+        return Span(trace, name, tags)
+
+    def finish(self, trace : Trace) -> None:
+        '''
+            This function hands a finished trace to the exporter.
+                :param trace: Trace
+                    The finished trace.
+        '''
+        try:
+            self.exporter.export(trace.to_dict())
+        except Exception as err:
+            # A failed export must not fail the message.
+            print(f"Tracer failed to export {trace.correlation_id} - {err}")
+            with self.counters_lock:
+                self.failed += 1
+            return
+        with self.counters_lock:
+            self.exported += 1
+
+    def stats(self) -> dict:
+        '''
+            This function returns the counters of the tracer.
+                :return: dict
+                    The sample rate and the exported and failed traces counts.
+        '''
+        with self.counters_lock:
+            return {
+                "sample_rate" : self.sample_rate,
+                "exported" : self.exported,
+                "failed" : self.failed
+            }
+
+# The tracer shared by all the modules, configured once at start-up.
+tracer = Tracer()
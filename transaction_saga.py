@@ -1,72 +1,474 @@
 # Importing all needed modules
-import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError
+from collections import deque
+import contextvars
 import threading
+import requests
+import time
+from replica_balancer import ReplicaBalancer, Replica
+from circuit_breaker import CircuitBreaker
+from micro_batcher import MicroBatcher
+from http_client import HttpClient
 from cerber import SecurityManager
+from metrics import metrics
+from tracing import tracer
+from codec import codec
+
+# Declaring the metrics of the saga.
+metrics.histogram("dialog_manager_sidecar_request_seconds", "The duration of the requests to the sidecars.")
+metrics.counter("dialog_manager_saga_timeouts", "The number of sidecars that didn't respond before the saga deadline.")
+metrics.counter("dialog_manager_circuit_rejections", "The number of sidecar requests rejected by an open circuit breaker.")
+metrics.counter("dialog_manager_sidecar_hedges", "The number of hedged sidecar requests sent.")
+metrics.counter("dialog_manager_sidecar_hedges_won", "The number of hedged sidecar requests answering first.")
+
+
+class TimedOut:
+    '''
+        The marker of a service that didn't respond before the deadline of the saga.
+    '''
+    def __repr__(self) -> str:
+        return "TIMED_OUT"
+
+    def __bool__(self) -> bool:
+        return False
+
+
+TIMED_OUT = TimedOut()
+
+
+class LatencyWindow:
+    def __init__(self, size : int = 200, min_samples : int = 50, refresh : int = 20) -> None:
+        '''
+            The constructor of the window of the last latencies of a service.
+                :param size: int, default = 200
+                    The number of latencies kept.
+                :param min_samples: int, default = 50
+                    The number of latencies needed before a percentile is given.
+                :param refresh: int, default = 20
+                    The number of new latencies after which the percentiles are recomputed.
+        '''
+        self.latencies = deque(maxlen=size)
+        self.min_samples = min_samples
+        self.refresh = refresh
+        self.pending = 0
+        self.percentiles = {}
+        self.lock = threading.Lock()
+
+    def record(self, latency : float) -> None:
+        '''
+            This function adds a latency to the window.
+                :param latency: float
+                    The number of seconds a successful request took.
+        '''
+        with self.lock:
+            self.latencies.append(latency)
+            self.pending += 1
+            if self.pending >= self.refresh:
+                self.pending = 0
+                self.percentiles = {}
+
+    def percentile(self, percentile : float) -> float:
+        '''
+            This function returns a percentile of the kept latencies.
+                :param percentile: float
+                    The percentile, between 0 and 1.
+                :return: float
+                    The latency in seconds or None if the window doesn't have enough latencies.
+        '''
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            if percentile not in self.percentiles:
+                latencies = sorted(self.latencies)
+                self.percentiles[percentile] = latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+            return self.percentiles[percentile]
 
 
 class TransactionSaga:
-    def __init__(self, services : dict) -> None:
+    def __init__(self,
+                 services : dict,
+                 http_client : HttpClient = None,
+                 max_workers : int = 32,
+                 deadline : float = 5.0,
+                 service_timeouts : dict = None,
+                 breaker_options : dict = None,
+                 balancer_options : dict = None,
+                 hedging : bool = False,
+                 hedge_percentile : float = 0.95,
+                 batching_options : dict = None) -> None:
         '''
             The constructor of the Transaction Saga.
                 :param services: dict
                     The dictionary containing the service credentials.
+                    A service listing "replicas", {"host", "port"} dictionaries, is balanced between them,
+                    else its "general" host and port are used.
+                :param http_client: HttpClient, default = None
+                    The shared HTTP client used to call the services.
+                :param max_workers: int, default = 32
+                    The number of threads of the executor requesting the services.
+                :param deadline: float, default = 5.0
+                    The number of seconds a saga waits for the services responses.
+                :param service_timeouts: dict, default = None
+                    The mapping of service names to their request timeout in seconds.
+                    The services missing from it are given the whole deadline.
+                :param breaker_options: dict, default = None
+                    The arguments of the circuit breaker of every service.
+                :param balancer_options: dict, default = None
+                    The arguments of the replica balancer of every service.
+                :param hedging: bool, default = False
+                    True to send a duplicate request to another replica once a request
+                    takes longer than the hedge percentile of the service latencies.
+                :param hedge_percentile: float, default = 0.95
+                    The percentile of the latencies after which a request is hedged.
+                :param batching_options: dict, default = None
+                    The arguments of the micro batcher of every service, the requests being sent
+                    one by one if None.
         '''
         self.services = services
+        self.http_client = http_client if http_client is not None else HttpClient()
         self.security_managers = {
             service : SecurityManager(services[service]["security"]["secret_key"])
             for service in services
         }
-        self.condition = threading.Condition()
-        self.response_gatherer = {}
-        self.response_gatherer_lock = threading.Lock()
+        self.deadline = deadline
+        self.service_timeouts = service_timeouts if service_timeouts is not None else {}
+
+        # Creation of the circuit breakers and of the latency windows of the services.
+        breaker_options = breaker_options if breaker_options is not None else {}
+        self.breakers = {service : CircuitBreaker(**breaker_options) for service in services}
+        self.latencies = {service : LatencyWindow() for service in services}
+
+        # Creation of the balancers choosing the replica of every request.
+        balancer_options = balancer_options if balancer_options is not None else {}
+        self.balancers = {
+            service : ReplicaBalancer(services[service].get("replicas") or [services[service]["general"]], **balancer_options)
+            for service in services
+        }
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+
+        # Setting up the hedging counters.
+        self.counters_lock = threading.Lock()
+        self.hedges = {service : 0 for service in services}
+        self.hedges_won = {service : 0 for service in services}
+
+        # Creation of the executor reused by all the sagas.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transaction-saga")
+
+        # Creation of the executor running the hedged requests, apart so that waiting sagas can't starve it.
+        self.request_executor = ThreadPoolExecutor(max_workers=2 * max_workers, thread_name_prefix="transaction-saga-requests") \
+            if hedging else None
+
+        # Creation of the batchers grouping the concurrent requests to the /serve_batch endpoints.
+        # A service answering 404 there is requested one request at a time from then on.
+        self.batchers = {}
+        if batching_options is not None:
+            self.batchers = {
+                service : MicroBatcher(service, lambda items, service=service : self.send_batch(service, items), **batching_options)
+                for service in services
+            }
+
+    def call(self, service_name : str, replica : Replica, body : bytes, headers : dict, timeout : float, token : tuple,
+             hedge : bool = False) -> tuple:
+        '''
+            This function sends a signed request to one replica of a service and records its outcome.
+                :param service_name: str
+                    The name of the service.
+                :param replica: Replica
+                    The replica acquired from the balancer of the service, released once it answers.
+                :param body: bytes
+                    The signed request body.
+                :param headers: dict
+                    The headers carrying the signature.
+                :param timeout: float
+                    The number of seconds to wait for the response.
+                :param token: tuple
+                    The token given by the breaker of the service for the request.
+                :param hedge: bool, default = False
+                    True if the request duplicates a slow one.
+                :return: tuple
+                    True and the prediction if the service answered, else False and None.
+        '''
+        start = time.perf_counter()
+        succeeded, prediction = False, None
+        try:
+            with metrics.timer("dialog_manager_sidecar_request_seconds", service=service_name), \
+                    tracer.span("sidecar_request", service=service_name, replica=replica.address, hedge=hedge) as span:
+                response = self.http_client.post(
+                    f"http://{replica.address}/serve",
+                    data = body,
+                    headers = headers,
+                    timeout = (self.http_client.timeout[0], timeout)
+                )
+            span.tag(status_code=response.status_code)
+            if response.status_code == 200:
+                succeeded, prediction = True, codec.decode_response(response)["prediction"]
+        except requests.RequestException:
+            pass
+        finally:
+            # Feeding the outcome to the breaker, the latency window and the balancer of the service.
+            duration = time.perf_counter() - start
+            self.balancers[service_name].release(replica, succeeded, duration)
+            self.breakers[service_name].record(token, succeeded, duration)
+            if succeeded:
+                self.latencies[service_name].record(duration)
+        return succeeded, prediction
+
+    def send_batch(self, service_name : str, items : list) -> list:
+        '''
+            This function sends a batch of requests to one replica of a service.
+                :param service_name: str
+                    The name of the service.
+                :param items: list
+                    The request payloads, each with a text and a correlation id.
+                :return: list
+                    The (succeeded, prediction) outcome of every request in the order of the items,
+                    None marking the requests to send one by one as the service doesn't serve batches.
+        '''
+        # Keying the requests by their correlation ids, the predictions being routed back by them.
+        keys = [item.get("correlation_id", str(index)) for index, item in enumerate(items)]
+        body, headers = self.security_managers[service_name].sign_request(
+            {"items" : [dict(item, correlation_id=key) for item, key in zip(items, keys)]},
+            binary = True
+        )
+
+        # Sending the batch to the replica with the least outstanding requests.
+        replica = self.balancers[service_name].acquire()
+        start = time.perf_counter()
+        try:
+            with metrics.timer("dialog_manager_sidecar_request_seconds", service=service_name):
+                response = self.http_client.post(
+                    f"http://{replica.address}/serve_batch",
+                    data = body,
+                    headers = headers,
+                    timeout = (self.http_client.timeout[0], self.service_timeouts.get(service_name, self.deadline))
+                )
+        except requests.RequestException:
+            self.balancers[service_name].release(replica, False, time.perf_counter() - start)
+            return [(False, None)] * len(items)
+        self.balancers[service_name].release(replica, response.status_code in (200, 404), time.perf_counter() - start)
+
+        if response.status_code == 404:
+            # The service doesn't serve batches.
+            self.batchers.pop(service_name, None)
+            return [None] * len(items)
+        elif response.status_code != 200:
+            return [(False, None)] * len(items)
+
+        predictions = codec.decode_response(response)["predictions"]
+        return [(key in predictions, predictions.get(key)) for key in keys]
+
+    def record_batched(self, service_name : str, token : tuple, start : float, future) -> None:
+        '''
+            This function feeds the outcome of a batched request to the breaker and the latency window
+            once its batch answered, unless the request must be sent alone.
+                :param service_name: str
+                    The name of the service.
+                :param token: tuple
+                    The token given by the breaker of the service for the request.
+                :param start: float
+                    The perf counter time the request was submitted at.
+                :param future: Future
+                    The future of the request in its batch.
+        '''
+        try:
+            outcome = future.result()
+        except Exception:
+            # The batch failed.
+            outcome = (False, None)
+        if outcome is not None:
+            duration = time.perf_counter() - start
+            self.breakers[service_name].record(token, outcome[0], duration)
+            if outcome[0]:
+                self.latencies[service_name].record(duration)
 
-    def request_service(self, service_name : str, json : dict) -> None:
+    def send_hedge(self, service_name : str, body : bytes, headers : dict, timeout : float, exclude : Replica = None):
         '''
-            This function send the request to the required service concurrently.
+            This function duplicates a slow request to another replica of the service.
+                :param service_name: str
+                    The name of the service.
+                :param body: bytes
+                    The signed request body.
+                :param headers: dict
+                    The headers carrying the signature.
+                :param timeout: float
+                    The number of seconds to wait for the response.
+                :param exclude: Replica, default = None
+                    The replica the slow request was sent to.
+                :return: Future
+                    The future of the hedged request or None if the circuit of the service rejected it.
+        '''
+        token = self.breakers[service_name].allow()
+        if token is None:
+            return None
+        hedge = self.request_executor.submit(
+            contextvars.copy_context().run, self.call, service_name, self.balancers[service_name].acquire(exclude=exclude),
+            body, headers, timeout, token, True
+        )
+        with self.counters_lock:
+            self.hedges[service_name] += 1
+        metrics.increment("dialog_manager_sidecar_hedges", service=service_name)
+        return hedge
+
+    def hedge_won(self, service_name : str) -> None:
+        '''
+            This function counts a hedged request answering first.
+                :param service_name: str
+                    The name of the service.
+        '''
+        with self.counters_lock:
+            self.hedges_won[service_name] += 1
+        metrics.increment("dialog_manager_sidecar_hedges_won", service=service_name)
+
+    def request_service(self, service_name : str, json : dict):
+        '''
+            This function sends the request to the required service.
+            With hedging on, a request still unanswered after the hedge percentile of the service latencies
+            is duplicated to another replica, the batched requests being duplicated as single requests.
                 :param service_name: str
                     The name of the service.
                 :param json: dict
                     The request payload.
+                :return: any
+                    The prediction of the service or None if the request failed or the circuit is open.
         '''
-        # Computing the HMAC for the request to the service.
-        hmac = self.security_managers[service_name]._SecurityManager__encode_hmac(json)
+        # Failing fast while the circuit of the service is open.
+        token = self.breakers[service_name].allow()
+        if token is None:
+            metrics.increment("dialog_manager_circuit_rejections", service=service_name)
+            return None
+
+        timeout = self.service_timeouts.get(service_name, self.deadline)
+        balancer = self.balancers[service_name]
+        hedge_delay = self.latencies[service_name].percentile(self.hedge_percentile) if self.hedging else None
+
+        # Adding the request to the next batch of the service.
+        batcher = self.batchers.get(service_name)
+        if batcher is not None:
+            start = time.perf_counter()
+            with tracer.span("sidecar_request", service=service_name, batched=True):
+                batch = batcher.submit(json)
+                # Feeding the outcome of the batch even if a hedged request answered first.
+                batch.add_done_callback(lambda future : self.record_batched(service_name, token, start, future))
+
+                # Not hedging a single replica service, as the hedge would go to the replica of the batch.
+                pending, hedge = {batch}, None
+                if hedge_delay is not None and len(balancer.replicas) >= 2:
+                    done, _ = wait(pending, timeout=hedge_delay)
+                    if not done:
+                        body, headers = self.security_managers[service_name].sign_request(json, binary=True)
+                        hedge = self.send_hedge(service_name, body, headers, timeout)
+                        if hedge is not None:
+                            pending.add(hedge)
+
+                # Waiting for the first successful answer within the timeout.
+                send_alone = False
+                while pending:
+                    done, pending = wait(pending, timeout=max(0.0, start + timeout - time.perf_counter()), return_when=FIRST_COMPLETED)
+                    if not done:
+                        break
+                    for future in done:
+                        try:
+                            outcome = future.result()
+                        except Exception:
+                            outcome = (False, None)
+                        if outcome is None:
+                            # The service doesn't serve batches.
+                            send_alone = True
+                        elif outcome[0]:
+                            if future is hedge:
+                                self.hedge_won(service_name)
+                            return outcome[1]
+            if not send_alone:
+                return None
+
+        # Serializing the payload once and signing the sent bytes.
+        body, headers = self.security_managers[service_name].sign_request(json, binary=True)
+
+        # Making the request to the service within its timeout.
+        if hedge_delay is None:
+            return self.call(service_name, balancer.acquire(), body, headers, timeout, token)[1]
 
-        # Making the request to the service.
-        response = requests.post(
-            f"http://{self.services[service_name]['general']['host']}:{self.services[service_name]['general']['port']}/serve",
-            json = json,
-            headers = {"Token" : hmac}
+        # Sending the request and waiting for it up to the hedge delay.
+        replica = balancer.acquire()
+        primary = self.request_executor.submit(
+            contextvars.copy_context().run, self.call, service_name, replica, body, headers, timeout, token
         )
+        done, _ = wait([primary], timeout=hedge_delay)
 
-        # Acquiring the response gatherer lock.
-        self.response_gatherer_lock.acquire()
-        if response.status_code == 200:
-            # Adding the response to the response gatherer.
-            self.response_gatherer[service_name] = response.json()["prediction"]
-        else:
-            # Adding None if the response failed.
-            self.response_gatherer[service_name] = None
-        # Checking if all services responded.
-        if len(self.response_gatherer) == len(self.services):
-            with self.condition:
-                # Notifying the condition that all responses where gathered.
-                self.condition.notify()
-        self.response_gatherer_lock.release()
-
-    def start(self, json : dict) -> dict:
+        # Not hedging a single replica service, as acquire(exclude=replica) would give the same replica back.
+        # The replicas are checked before the breaker so that no half open probe is taken for nothing.
+        if done or len(balancer.replicas) < 2:
+            return primary.result()[1]
+
+        # Duplicating the slow request to another replica, the first answer winning.
+        hedge = self.send_hedge(service_name, body, headers, timeout, exclude=replica)
+        if hedge is None:
+            return primary.result()[1]
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                succeeded, prediction = future.result()
+                if succeeded:
+                    if future is hedge:
+                        self.hedge_won(service_name)
+                    return prediction
+        return None
+
+    def start(self, json : dict, service_names : list = None, deadline : float = None) -> dict:
         '''
             This function runs the Transaction Saga and returns the results of the requests.
                 :param json: dict
                     The request payload.
+                :param service_names: list, default = None
+                    The services to request, all the services if None.
+                :param deadline: float, default = None
+                    The number of seconds to wait for the responses, the saga deadline if None.
                 :returns: dict
-                    The results of the requests.
+                    The results of the requests, TIMED_OUT marking the services that
+                    didn't respond before the deadline.
         '''
-        # Starting the threads of requests.
-        for service_name in self.services:
-            threading.Thread(target=self.request_service, args=(service_name, json)).start()
+        if service_names is None:
+            service_names = list(self.services)
+
+        # Submitting the requests to the executor, each request running in a copy of the caller context.
+        futures = {
+            self.executor.submit(contextvars.copy_context().run, self.request_service, service_name, json) : service_name
+            for service_name in service_names
+        }
+
+        # Waiting for the requests to finish or for the deadline to pass.
+        done, _ = wait(futures, timeout=deadline if deadline is not None else self.deadline)
 
-        # Waiting for the requests to finish.
-        with self.condition:
-            self.condition.wait()
+        # Gathering the results, the late services being marked as timed out.
+        response_gatherer = {}
+        for future in futures:
+            if future in done:
+                response_gatherer[futures[future]] = future.result() if future.exception() is None else None
+            else:
+                future.cancel()
+                response_gatherer[futures[future]] = TIMED_OUT
+                metrics.increment("dialog_manager_saga_timeouts", service=futures[future])
+        return response_gatherer
 
-        return self.response_gatherer
\ No newline at end of file
+    def stats(self) -> dict:
+        '''
+            This function returns the circuit breakers states, the hedging counters and the replicas of the services.
+                :return: dict
+                    The mapping of every service to its breaker stats, hedge delay, hedges counts and replicas stats.
+        '''
+        with self.counters_lock:
+            return {
+                service : {
+                    "breaker" : self.breakers[service].stats(),
+                    "hedge_delay" : self.latencies[service].percentile(self.hedge_percentile),
+                    "hedges" : self.hedges[service],
+                    "hedges_won" : self.hedges_won[service],
+                    "replicas" : self.balancers[service].stats()
+                }
+                for service in self.services
+            }
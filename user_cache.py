@@ -0,0 +1,113 @@
+# Importing all needed modules.
+from collections import OrderedDict
+import threading
+import time
+
+
+class UserIdentity:
+    __slots__ = ("user_id", "app_id")
+
+    def __init__(self, user_id : str, app_id : int) -> None:
+        '''
+            The constructor of a User Identity.
+                :param user_id: str
+                    The id of the user in the Data Base.
+                :param app_id: int
+                    The id of the user in the application.
+        '''
+        self.user_id = user_id
+        self.app_id = app_id
+
+
+class UserIdentityCache:
+    def __init__(self, loader, ttl : float = 300, negative_ttl : float = 10, max_entries : int = 100000) -> None:
+        '''
+            The constructor of the User Identity Cache.
+                :param loader: callable
+                    The function loading a user from the Data Base.
+                    It is called as loader(telegram_user_id) and returns a UserIdentity
+                    or None if the user isn't registered.
+                :param ttl: float, default = 300
+                    The number of seconds a registered user is served from memory.
+                :param negative_ttl: float, default = 10
+                    The number of seconds an unknown telegram user id is remembered as unregistered.
+                :param max_entries: int, default = 100000
+                    The maximal number of users kept in memory.
+        '''
+        # Setting up the class fields.
+        self.loader = loader
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        # The entries are kept from the least to the most recently used.
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        # The generations of the invalidated users, a load only being stored if the generation didn't change.
+        self.generations = OrderedDict()
+
+        # Setting up the counters of the cache.
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, telegram_user_id : int) -> UserIdentity:
+        '''
+            This function returns the identity of a telegram user.
+                :param telegram_user_id: int
+                    The telegram id of the user.
+                :return: UserIdentity
+                    The identity of the user or None if the user isn't registered.
+        '''
+        with self.lock:
+            entry = self.entries.get(telegram_user_id)
+            if entry is not None and entry[1] >= time.monotonic():
+                self.entries.move_to_end(telegram_user_id)
+                if entry[0] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self.generations.get(telegram_user_id, 0)
+
+        # Loading the user from the Data Base outside of the lock.
+        identity = self.loader(telegram_user_id)
+        expires_at = time.monotonic() + (self.ttl if identity is not None else self.negative_ttl)
+        with self.lock:
+            # Not storing a load started before the user was invalidated, as it could be stale.
+            if self.generations.get(telegram_user_id, 0) != generation:
+                return identity
+            self.entries[telegram_user_id] = (identity, expires_at)
+            self.entries.move_to_end(telegram_user_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, telegram_user_id : int) -> None:
+        '''
+            This function drops the cached identity of a telegram user.
+            The loads of the user running at the same time won't be stored.
+                :param telegram_user_id: int
+                    The telegram id of the user.
+        '''
+        with self.lock:
+            self.entries.pop(telegram_user_id, None)
+            self.generations[telegram_user_id] = self.generations.pop(telegram_user_id, 0) + 1
+            while len(self.generations) > self.max_entries:
+                self.generations.popitem(last=False)
+
+    def stats(self) -> dict:
+        '''
+            This function returns the counters of the cache.
+                :return: dict
+                    The entries count, hits, negative hits and misses counters.
+        '''
+        with self.lock:
+            return {
+                "entries" : len(self.entries),
+                "hits" : self.hits,
+                "negative_hits" : self.negative_hits,
+                "misses" : self.misses
+            }